@@ -17,23 +17,21 @@ class RecipeAdmin(admin.ModelAdmin):
     ordering = ('-created',)
     readonly_fields = ('likes',)
     autocomplete_fields = ('author',)
-    list_select_related = ('author',)
 
     def get_queryset(self, request):
         """
-        Optimize admin list query to prefetch related images,
-        avoiding N+1 queries when calling thumbnail_preview().
+        Join the author and cover image, so thumbnail_preview() renders
+        without a query per row.
         """
-        qs = super().get_queryset(request)
-        return qs.prefetch_related('images')  # assumes related_name='images' in RecipeImage
+        return super().get_queryset(request).for_admin()
 
     def thumbnail_preview(self, obj):
         """Show small recipe image preview if available."""
-        image = obj.images.first()
+        image = obj.cover_image
         if image and image.image:
             return format_html(
                 '<img src="{}" width="60" height="60" style="border-radius:5px; object-fit:cover;" />',
-                image.image.url
+                image.rendition_url('thumb')
             )
         return "—"
 
@@ -79,7 +77,7 @@ class RecipeImageAdmin(admin.ModelAdmin):
     def image_preview(self, obj):
         """Show small image preview in admin list"""
         if obj.image:
-            return format_html('<img src="{}" width="60" height="60" style="border-radius:5px; object-fit:cover;" />', obj.image.url)
+            return format_html('<img src="{}" width="60" height="60" style="border-radius:5px; object-fit:cover;" />', obj.rendition_url('thumb'))
         return "—"
     image_preview.short_description = "Image"
 
@@ -119,23 +117,16 @@ class RecipeLikeAdmin(admin.ModelAdmin):
     list_filter = ('created', 'recipe__category', 'recipe__difficulty')
     ordering = ('-created',)
     autocomplete_fields = ('user', 'recipe')
-    list_select_related = ('user', 'recipe')
-
-    def get_queryset(self, request):
-        """
-        Fetch related recipe images efficiently to avoid N+1 queries
-        when rendering recipe_thumbnail().
-        """
-        qs = super().get_queryset(request)
-        return qs.prefetch_related('recipe__images')
+    # The cover image join lets recipe_thumbnail() render without a query per row.
+    list_select_related = ('user', 'recipe__cover_image')
 
     def recipe_thumbnail(self, obj):
         """Display a small thumbnail of the liked recipe."""
-        image = obj.recipe.images.first()
+        image = obj.recipe.cover_image
         if image and image.image:
             return format_html(
                 '<img src="{}" width="50" height="50" style="border-radius:5px; object-fit:cover;" />',
-                image.image.url
+                image.rendition_url('thumb')
             )
         return "—"
 
@@ -0,0 +1,120 @@
+"""
+Field registry for the read-only JSON API.
+
+Each field names the columns, joins and prefetches it needs, so a
+``?fields=`` sparse fieldset only loads what the response contains.
+"""
+from django.db.models import Prefetch
+
+from .models import Ingredient, ordered_images_prefetch
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+class ApiField:
+    def __init__(self, columns=(), select=(), prefetch=None, value=None):
+        self.columns = columns
+        self.select = select
+        self.prefetch = prefetch
+        self.value = value
+
+
+def _column(name):
+    return ApiField(columns=(name,), value=lambda recipe, request: getattr(recipe, name))
+
+
+def _cover(recipe, request):
+    return request.build_absolute_uri(recipe.get_first_image_card_url())
+
+
+def _nutrition(recipe, request):
+    nutrition = getattr(recipe, 'nutrition', None)
+    if nutrition is None:
+        return None
+    return {field: getattr(nutrition, field) for field in NUTRITION_FIELDS}
+
+
+def _ingredients(recipe, request):
+    return [
+        {'name': i.name, 'quantity': i.quantity, 'unit': i.unit, 'optional': i.optional}
+        for i in recipe.ingredients.all()
+    ]
+
+
+def _images(recipe, request):
+    return [
+        request.build_absolute_uri(image.rendition_url('hero'))
+        for image in recipe.ordered_images
+        if image.image
+    ]
+
+
+NUTRITION_FIELDS = ('calories', 'protein', 'fat', 'sugar', 'fiber', 'carbohydrates')
+
+FIELDS = {
+    'id': _column('id'),
+    'title': _column('title'),
+    'cuisine': _column('cuisine'),
+    'category': _column('category'),
+    'difficulty': _column('difficulty'),
+    'servings': _column('servings'),
+    'prep_time': _column('prep_time'),
+    'total_time': _column('total_time'),
+    'likes': _column('likes'),
+    'created': _column('created'),
+    'modified': _column('modified'),
+    'instructions': _column('instructions'),
+    'steps': _column('steps'),
+    'author': ApiField(
+        columns=('author__username',), select=('author',),
+        value=lambda recipe, request: recipe.author.username,
+    ),
+    'cover': ApiField(
+        columns=('cover_image__image', 'cover_image__renditions'), select=('cover_image',), value=_cover,
+    ),
+    'nutrition': ApiField(
+        columns=tuple(f'nutrition__{field}' for field in NUTRITION_FIELDS), select=('nutrition',),
+        value=_nutrition,
+    ),
+    'ingredients': ApiField(
+        prefetch=lambda: Prefetch('ingredients', queryset=Ingredient.objects.order_by('pk')),
+        value=_ingredients,
+    ),
+    'images': ApiField(prefetch=ordered_images_prefetch, value=_images),
+}
+
+LIST_FIELDS = (
+    'id', 'title', 'cuisine', 'category', 'difficulty', 'total_time', 'likes', 'cover', 'author', 'created',
+)
+DETAIL_FIELDS = tuple(FIELDS)
+# Cursor pagination seeks on these, so they are loaded even when not requested.
+ALWAYS_LOADED = ('id', 'created')
+
+
+def parse_fields(value, default):
+    """Requested field names from ``?fields=a,b``, in the order given."""
+    if not value:
+        return default
+    names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in names if name not in FIELDS]
+    if unknown:
+        raise InvalidFields(f"Unknown fields: {', '.join(unknown)}.")
+    return tuple(names) or default
+
+
+def shape_queryset(queryset, fields):
+    """Restrict ``queryset`` to the columns, joins and prefetches ``fields`` need."""
+    specs = [FIELDS[name] for name in fields]
+    columns = {column for spec in specs for column in spec.columns}
+    select = {relation for spec in specs for relation in spec.select}
+    prefetches = [spec.prefetch() for spec in specs if spec.prefetch]
+    queryset = queryset.select_related(None)
+    if select:
+        queryset = queryset.select_related(*sorted(select))
+    return queryset.only(*ALWAYS_LOADED, *sorted(columns)).prefetch_related(*prefetches)
+
+
+def serialize(recipe, fields, request):
+    return {name: FIELDS[name].value(recipe, request) for name in fields}
@@ -0,0 +1,239 @@
+"""
+In-memory prefix index for search-as-you-type suggestions.
+
+Recipe titles, cuisines, ingredient names and logged searches made at least
+``MIN_QUERY_COUNT`` times are kept in one sorted list per process, so a
+lookup is a binary search plus a short scan instead of a database query. Every word of an entry is indexed,
+so "tikka" suggests "Chicken Tikka Masala".
+
+Recipe and ingredient changes bump a generation in the cache (see
+``recipe.caching``); the first lookup that notices starts a rebuild on a
+background thread and lookups keep using the current index until it is
+swapped in. Rebuilds run at most once per ``MIN_REBUILD_INTERVAL``, and in
+any case after ``MAX_AGE`` so logged searches show up without a write per
+query. The generation only
+reaches other worker processes through a shared cache (``REDIS_URL``); with
+the default per-process cache they see changes made elsewhere only once
+their index is ``MAX_AGE`` old.
+"""
+import heapq
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import caching
+
+logger = logging.getLogger(__name__)
+
+TITLE = 'recipe'
+CUISINE = 'cuisine'
+INGREDIENT = 'ingredient'
+QUERY = 'query'
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+MIN_PREFIX_LENGTH = 2
+MAX_QUERY_LENGTH = 100
+POPULAR_QUERIES = 1000
+# Logged searches become suggestions only once this many visitors typed them,
+# so one-off typos or junk are never offered to anybody else.
+MIN_QUERY_COUNT = 3
+MIN_REBUILD_INTERVAL = 5
+MAX_AGE = 60 * 10
+
+_WORD_START = re.compile(r'(?:^|(?<=\W))\w', re.UNICODE)
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(text):
+    return _SPACES.sub(' ', (text or '').casefold()).strip()
+
+
+class PrefixIndex:
+    """
+    Rows ``(key, weight, text, kind, pk)`` sorted by key, one per word start
+    of each entry, plus a segment tree of the heaviest row of every span.
+
+    A prefix maps to a contiguous span of rows; the top suggestions are
+    pulled from the tree heaviest first, so a lookup costs
+    O(limit * log n) however many rows share the prefix.
+    """
+
+    def __init__(self, entries):
+        rows = []
+        for text, kind, weight, pk in entries:
+            normalized = normalize(text)
+            for match in _WORD_START.finditer(normalized):
+                rows.append((normalized[match.start():], weight, text, kind, pk))
+        rows.sort(key=lambda row: row[0])
+        self.keys = [row[0] for row in rows]
+        self.rows = rows
+
+        self.size = 1
+        while self.size < len(rows):
+            self.size *= 2
+        self.tree = [-1] * (2 * self.size)
+        self.tree[self.size:self.size + len(rows)] = range(len(rows))
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = self._heavier(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _heavier(self, a, b):
+        if a < 0 or (b >= 0 and self.rows[b][1] > self.rows[a][1]):
+            return b
+        return a
+
+    def _heaviest(self, lo, hi):
+        """Index of the heaviest row in ``rows[lo:hi]``."""
+        best = -1
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                best = self._heavier(best, self.tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = self._heavier(best, self.tree[hi])
+            lo //= 2
+            hi //= 2
+        return best
+
+    def _push(self, heap, lo, hi):
+        if lo < hi:
+            index = self._heaviest(lo, hi)
+            heapq.heappush(heap, (-self.rows[index][1], index, lo, hi))
+
+    def lookup(self, prefix, limit=DEFAULT_LIMIT):
+        prefix = normalize(prefix)
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            return []
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\uffff', lo=start)
+
+        heap, seen, results = [], set(), []
+        self._push(heap, start, end)
+        while heap and len(results) < limit:
+            _, index, lo, hi = heapq.heappop(heap)
+            _, _, text, kind, pk = self.rows[index]
+            identity = (kind, pk if pk is not None else text.casefold())
+            if identity not in seen:
+                seen.add(identity)
+                results.append({'text': text, 'kind': kind, 'pk': pk})
+            self._push(heap, lo, index)
+            self._push(heap, index + 1, hi)
+        return results
+
+
+def _entries():
+    from .models import Ingredient, Recipe, SearchQuery
+
+    for pk, title, likes in Recipe.objects.values_list('pk', 'title', 'likes').iterator():
+        yield title, TITLE, likes + 1, pk
+    for row in Recipe.objects.order_by().values('cuisine').annotate(recipes=Count('pk')):
+        if row['cuisine']:
+            yield row['cuisine'], CUISINE, row['recipes'], None
+    for row in Ingredient.objects.order_by().values('name').annotate(recipes=Count('recipe', distinct=True)):
+        if row['name']:
+            yield row['name'], INGREDIENT, row['recipes'], None
+    popular = SearchQuery.objects.filter(count__gte=MIN_QUERY_COUNT).order_by('-count')
+    for query, count in popular.values_list('query', 'count')[:POPULAR_QUERIES]:
+        yield query, QUERY, count, None
+
+
+def build_index():
+    return PrefixIndex(_entries())
+
+
+_state = {'index': None, 'version': None, 'built': 0.0}
+_lock = threading.Lock()
+
+
+def _version():
+    return caching.namespaced(caching.AUTOCOMPLETE_KEY, 'index')
+
+
+def _is_stale():
+    # Only generations bumped in this process are visible unless the cache is shared.
+    age = time.monotonic() - _state['built']
+    if age > MAX_AGE:
+        return True
+    return age > MIN_REBUILD_INTERVAL and _state['version'] != _version()
+
+
+def _rebuild():
+    version = _version()
+    _state.update(index=build_index(), version=version, built=time.monotonic())
+    return _state['index']
+
+
+def invalidate():
+    caching.invalidate(caching.AUTOCOMPLETE_KEY)
+
+
+def warm():
+    """Build this process's index now rather than on the first lookup."""
+    with _lock:
+        return _rebuild()
+
+
+def warm_on_startup():
+    """``warm()`` for server entry points; a missing table must not stop the server."""
+    try:
+        warm()
+    except DatabaseError:
+        logger.warning("Autocomplete index not warmed; it will be built on first use.", exc_info=True)
+
+
+def _rebuild_in_background():
+    """Thread target for ``get_index``; the caller already holds ``_lock``."""
+    try:
+        _rebuild()
+    except Exception:
+        logger.exception("Rebuilding the autocomplete index failed; serving the previous one.")
+        # Back off instead of retrying on every lookup.
+        _state['built'] = time.monotonic()
+    finally:
+        _lock.release()
+        # The thread ends here and its connection would otherwise stay open.
+        connections.close_all()
+
+
+def get_index():
+    index = _state['index']
+    if index is None:
+        return warm()
+    if _is_stale() and _lock.acquire(blocking=False):
+        # No request waits for the rebuild; all keep serving ``index`` meanwhile.
+        threading.Thread(target=_rebuild_in_background, name='autocomplete-rebuild', daemon=True).start()
+    return index
+
+
+def suggest(prefix, limit=DEFAULT_LIMIT):
+    return get_index().lookup(prefix, min(limit, MAX_LIMIT))
+
+
+def log_query(text):
+    """Count one search for ``text`` in the query log used for suggestions."""
+    from .models import SearchQuery
+
+    query = normalize(text)[:MAX_QUERY_LENGTH]
+    if len(query) < MIN_PREFIX_LENGTH:
+        return
+    now = timezone.now()
+    if SearchQuery.objects.filter(query=query).update(count=F('count') + 1, last_searched=now):
+        return
+    try:
+        with transaction.atomic():
+            SearchQuery.objects.create(query=query, count=1, last_searched=now)
+    except IntegrityError:
+        # A concurrent request logged the same query first.
+        SearchQuery.objects.filter(query=query).update(count=F('count') + 1, last_searched=now)
@@ -0,0 +1,73 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import Ingredient, Nutrition, Recipe
+
+BENCHMARK_USERNAME = 'benchmark-seed'
+
+_WORDS = (
+    'tomato basil garlic onion paneer chicken rice lentil coconut ginger chilli '
+    'pasta cheese spinach potato mushroom lemon yogurt cumin coriander pepper '
+    'butter beans tofu noodle carrot mint honey almond saffron'
+).split()
+_CUISINES = ('Indian', 'Italian', 'Chinese', 'Mexican', 'Thai', 'French', 'Japanese', 'Greek')
+
+
+def seed_recipes(count, batch_size=1000, ingredients_per_recipe=6):
+    """Bulk insert ``count`` synthetic recipes owned by the benchmark user."""
+    user, _ = get_user_model().objects.get_or_create(username=BENCHMARK_USERNAME)
+    offset = Recipe.objects.filter(author=user).count()
+    rng = random.Random(offset)
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create([
+                Recipe(
+                    author=user,
+                    title=f"{' '.join(rng.sample(_WORDS, 3)).title()} #{offset + created + i}",
+                    cuisine=rng.choice(_CUISINES),
+                    category=rng.choice(Recipe.CategoryTypes.values),
+                    difficulty=rng.choice(Recipe.DifficultyLevels.values),
+                    servings=rng.randint(1, 8),
+                    prep_time=rng.randint(5, 60),
+                    total_time=rng.randint(60, 300),
+                    instructions='. '.join(' '.join(rng.sample(_WORDS, 8)) for _ in range(5)),
+                )
+                for i in range(size)
+            ])
+            Nutrition.objects.bulk_create([
+                Nutrition(
+                    recipe=recipe,
+                    calories=rng.randint(100, 1200),
+                    protein=rng.randint(0, 60),
+                    fat=rng.randint(0, 50),
+                    sugar=rng.randint(0, 30),
+                    fiber=rng.randint(0, 20),
+                    carbohydrates=rng.randint(0, 100),
+                )
+                for recipe in recipes
+            ])
+            Ingredient.objects.bulk_create([
+                Ingredient(recipe=recipe, name=name, quantity=rng.randint(1, 500))
+                for recipe in recipes
+                for name in rng.sample(_WORDS, ingredients_per_recipe)
+            ])
+        created += size
+    return created
+
+
+def time_call(func, repeat):
+    """Run ``func`` ``repeat`` times and return (median, p95) latency in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return statistics.median(samples), p95
@@ -0,0 +1,106 @@
+"""
+Cache helpers with explicit invalidation and stampede protection.
+
+Entries are stored together with the generation they were built for.
+``invalidate()`` bumps the generation instead of deleting the entry, so
+while one request recomputes a stale entry (holding a short lock) every
+other request keeps serving the stale copy rather than piling onto the
+database.
+
+Generations live in the default cache, so invalidations only reach other
+worker processes when that cache is shared. Set ``REDIS_URL`` to use Redis;
+without it Django's per-process LocMemCache is used and each worker only
+sees its own invalidations, serving entries up to ``DEFAULT_TIMEOUT`` old.
+"""
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+DEFAULT_TIMEOUT = 60 * 15
+# Stale entries outlive their freshness so they can be served during a recompute.
+STALE_GRACE = 60 * 5
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 0.05
+LOCK_RETRIES = 20
+
+HOMEPAGE_LATEST_KEY = 'homepage:latest'
+HOMEPAGE_POPULAR_KEY = 'homepage:popular'
+RECIPE_FACETS_KEY = 'recipes:facets'
+AUTOCOMPLETE_KEY = 'recipes:autocomplete'
+
+
+def _generation_key(key):
+    return f'{key}:generation'
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _generation(key):
+    return cache.get_or_set(_generation_key(key), 1, None)
+
+
+def invalidate(key):
+    try:
+        cache.incr(_generation_key(key))
+    except ValueError:
+        cache.set(_generation_key(key), 1, None)
+
+
+def invalidate_on_commit(*keys):
+    """Invalidate ``keys`` once the current transaction commits (immediately outside one)."""
+    for key in keys:
+        transaction.on_commit(partial(invalidate, key))
+
+
+def namespaced(namespace, suffix):
+    """
+    Key for one entry of a family of entries under ``namespace``.
+
+    ``invalidate(namespace)`` retires every key built this way at once;
+    the old entries simply expire.
+    """
+    return f'{namespace}:{_generation(namespace)}:{suffix}'
+
+
+def peek(key):
+    """Return the cached value of ``key`` (fresh or stale) without computing it."""
+    entry = cache.get(key)
+    return entry['value'] if entry else None
+
+
+def get_or_compute(key, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Return the cached value of ``key``, calling ``compute()`` on a miss.
+
+    Only the request that wins the lock recomputes; the others serve the
+    stale value if there is one, or wait briefly for the winner.
+    """
+    generation = _generation(key)
+    entry = cache.get(key)
+    if entry and entry['generation'] == generation and entry['expires'] > time.time():
+        return entry['value']
+
+    if cache.add(_lock_key(key), 1, LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(
+                key,
+                {'value': value, 'generation': generation, 'expires': time.time() + timeout},
+                timeout + STALE_GRACE,
+            )
+            return value
+        finally:
+            cache.delete(_lock_key(key))
+
+    if entry:
+        return entry['value']
+    for _ in range(LOCK_RETRIES):
+        time.sleep(LOCK_WAIT)
+        entry = cache.get(key)
+        if entry:
+            return entry['value']
+    return compute()
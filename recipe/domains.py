@@ -1,24 +1,151 @@
 # recipe/services.py
-from django.db import transaction
-from .models import Ingredient, Nutrition, Recipe, RecipeImage
+from functools import partial
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import Ingredient, Nutrition, Recipe, RecipeImage, RecipeLike
+from . import autocomplete, caching, likes, pantry, search, trending
+from .instructions import parse_instructions
+from .renditions import refresh_in_background
+
+
+def _uploaded_images(image_data):
+    """Uploaded files in ``image_data['image']``, which holds one file or a list of them."""
+    images = image_data.get('image')
+    if not isinstance(images, (list, tuple)):
+        images = [images]
+    return [image for image in images if image and image != 'default-recipe.jpg']
+
+
+def _add_images(recipe, image_data):
+    """Insert all uploaded images in one statement and refresh the recipe's covers."""
+    images = RecipeImage.objects.bulk_create([
+        RecipeImage(recipe=recipe, image=image)
+        for image in _uploaded_images(image_data)
+    ])
+    if images:
+        recipe.refresh_cover_images()
+        for image in images:
+            refresh_in_background(image)
+    return images
+
+
+def _ingredient_values(data):
+    return {
+        'name': data.get('name'),
+        'quantity': data.get('quantity') or 0,
+        'unit': data.get('unit'),
+        'optional': data.get('optional', False),
+    }
+
 
 @transaction.atomic
 def create_recipe_with_details(user, recipe_data, nutrition_data, image_data, ingredients_data):
     recipe = Recipe.objects.create(author=user, **recipe_data)
     Nutrition.objects.create(recipe=recipe, **nutrition_data)
     
-    image = image_data.get('image')
-    if image and image != 'default-recipe.jpg':
-        RecipeImage.objects.create(recipe=recipe, image=image)
-
-    for ing in ingredients_data:
-        Ingredient.objects.create(
-            recipe=recipe,
-            name=ing.get('name'),
-            quantity=ing.get('quantity') or 0,
-            unit=ing.get('unit'),
-            optional=ing.get('optional', False),
+    _add_images(recipe, image_data)
+
+    Ingredient.objects.bulk_create([
+        Ingredient(recipe=recipe, **_ingredient_values(ing))
+        for ing in ingredients_data
+    ])
+
+    pantry.index_recipe(recipe)
+    # The post_save index ran before the bulk created ingredients existed.
+    search.index_recipe(recipe)
+
+
+@transaction.atomic
+def create_recipes_in_bulk(user, rows):
+    """
+    Create many recipes with their nutrition and ingredients.
+
+    ``rows`` hold validated ``recipe``, ``nutrition`` and ``ingredients``
+    data, as produced by ``recipe.importing.parse_row``. Each table is
+    written with one ``bulk_create``; since that skips post_save, the
+    homepage fragments are invalidated here. Returns the new recipes.
+    """
+    recipes = Recipe.objects.bulk_create([
+        Recipe(
+            author=user,
+            steps=parse_instructions(row['recipe'].get('instructions', '')),
+            **row['recipe'],
         )
+        for row in rows
+    ])
+    Nutrition.objects.bulk_create([
+        Nutrition(recipe=recipe, **row['nutrition'])
+        for recipe, row in zip(recipes, rows)
+    ])
+    Ingredient.objects.bulk_create([
+        Ingredient(recipe=recipe, **_ingredient_values(ing))
+        for recipe, row in zip(recipes, rows)
+        for ing in row['ingredients']
+    ])
+    pantry.index_recipes(recipes)
+    search.index_recipes(recipes)
+    if recipes:
+        caching.invalidate_on_commit(
+            caching.HOMEPAGE_LATEST_KEY,
+            caching.HOMEPAGE_POPULAR_KEY,
+            caching.RECIPE_FACETS_KEY,
+        )
+        transaction.on_commit(autocomplete.invalidate)
+    return recipes
+
+
+INGREDIENT_FIELDS = ('name', 'quantity', 'unit', 'optional')
+
+
+def _normalized(model, field, value):
+    return model._meta.get_field(field).to_python(value)
+
+
+def _changed_fields(model, stored, data):
+    """Names of fields in ``data`` whose value differs from ``stored`` once normalized."""
+    return [
+        field for field, value in data.items()
+        if _normalized(model, field, value) != stored[field]
+    ]
+
+
+def _sync_ingredients(recipe, ingredients_data):
+    """
+    Apply submitted ingredient rows as a diff against the stored ones.
+
+    Rows are matched on ``id`` (a pk or the Ingredient instance a model
+    formset puts there). Changed rows go through one ``bulk_update``, new
+    ones through one ``bulk_create`` and missing ones through one delete.
+    Returns True when anything was written.
+    """
+    existing = {ingredient.pk: ingredient for ingredient in Ingredient.objects.filter(recipe=recipe)}
+    to_update, to_create, kept = [], [], set()
+
+    for data in ingredients_data:
+        pk = getattr(data.get('id'), 'pk', data.get('id'))
+        values = _ingredient_values(data)
+        ingredient = existing.get(pk)
+        if ingredient is None or pk in kept:
+            to_create.append(Ingredient(recipe=recipe, **values))
+            continue
+        kept.add(pk)
+        stored = {field: getattr(ingredient, field) for field in INGREDIENT_FIELDS}
+        changed = _changed_fields(Ingredient, stored, values)
+        if changed:
+            for field in changed:
+                setattr(ingredient, field, _normalized(Ingredient, field, values[field]))
+            to_update.append(ingredient)
+
+    removed = existing.keys() - kept
+    if removed:
+        Ingredient.objects.filter(pk__in=removed).delete()
+    if to_update:
+        Ingredient.objects.bulk_update(to_update, INGREDIENT_FIELDS)
+    if to_create:
+        Ingredient.objects.bulk_create(to_create)
+    return bool(removed or to_update or to_create)
+
 
 @transaction.atomic
 def update_recipe_with_details(
@@ -29,28 +156,72 @@ def update_recipe_with_details(
     image_data,
     ingredients_data,
 ):
+    """
+    Save an edited recipe, writing only what actually changed.
+
+    Values are compared with the stored rows rather than the instances,
+    which bound ModelForms have already modified in place.
+    """
+    stored = Recipe.objects.filter(pk=recipe.pk).values(*recipe_data, 'author_id').get()
+    recipe_changed = bool(_changed_fields(Recipe, stored, recipe_data)) or stored['author_id'] != user.pk
     for field, value in recipe_data.items():
         setattr(recipe, field, value)
     recipe.author = user
-    recipe.save()
 
-    nutrition, _ = Nutrition.objects.get_or_create(recipe=recipe)
-    for field, value in nutrition_data.items():
-        setattr(nutrition, field, value)
-    nutrition.save()
+    nutrition = Nutrition.objects.filter(recipe=recipe).first()
+    if nutrition is None:
+        Nutrition.objects.create(recipe=recipe, **nutrition_data)
+        nutrition_changed = True
+    else:
+        stored_nutrition = {field: getattr(nutrition, field) for field in nutrition_data}
+        nutrition_changed = bool(_changed_fields(Nutrition, stored_nutrition, nutrition_data))
+        if nutrition_changed:
+            for field, value in nutrition_data.items():
+                setattr(nutrition, field, value)
+            nutrition.save()
 
-    uploaded_image = image_data.get('image')
-    if uploaded_image and uploaded_image != 'default-recipe.jpg':
-        RecipeImage.objects.create(recipe=recipe, image=uploaded_image)
+    image_added = bool(_add_images(recipe, image_data))
 
-    Ingredient.objects.filter(recipe=recipe).delete()
-    Ingredient.objects.bulk_create([
-        Ingredient(
-            recipe=recipe,
-            name=ingredient.get('name'),
-            quantity=ingredient.get('quantity') or 0,
-            unit=ingredient.get('unit'),
-            optional=ingredient.get('optional', False),
-        )
-        for ingredient in ingredients_data
-    ])
+    ingredients_changed = _sync_ingredients(recipe, ingredients_data)
+
+    # Saving also bumps ``modified``, which detail page validators rely on.
+    if recipe_changed or nutrition_changed or image_added or ingredients_changed:
+        recipe.save()
+    if ingredients_changed:
+        pantry.index_recipe(recipe)
+
+@transaction.atomic
+def delete_recipe(recipe):
+    recipe.delete()
+
+@transaction.atomic
+def toggle_like(user, recipe):
+    """
+    Like or unlike ``recipe`` for ``user`` and keep ``Recipe.likes`` in step.
+
+    The counter moves with an F() update in the same transaction as the
+    RecipeLike insert; the RecipeLike ``post_delete`` receiver takes it back
+    off, so admin deletes and account cascades stay in step too. A
+    concurrent request that already inserted the like (e.g. a double click)
+    is treated as liked instead of raising. Returns ``(liked, total_likes)``.
+    """
+    existing = RecipeLike.objects.filter(user=user, recipe=recipe).values_list('pk', flat=True).first()
+    deleted = 0
+    if existing:
+        deleted, _ = RecipeLike.objects.filter(pk=existing).delete()
+    if deleted:
+        liked = False
+    else:
+        try:
+            with transaction.atomic():
+                like = RecipeLike.objects.create(user=user, recipe=recipe)
+        except IntegrityError:
+            pass
+        else:
+            Recipe.objects.filter(pk=recipe.pk).update(likes=F('likes') + 1)
+            trending.record_like(recipe.pk, like.created)
+        liked = True
+
+    transaction.on_commit(partial(likes.invalidate, user.pk))
+    recipe.likes = Recipe.objects.values_list('likes', flat=True).get(pk=recipe.pk)
+    return liked, recipe.likes
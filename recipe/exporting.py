@@ -0,0 +1,113 @@
+"""
+NDJSON export of the recipe catalogue.
+
+Each line is one recipe in the same shape ``recipe.importing`` reads,
+plus ids, timestamps and image URLs. Recipes are streamed with
+``.iterator(chunk_size=...)``; related rows are prefetched per chunk, so
+memory use does not grow with the size of the catalogue.
+"""
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Ingredient, Recipe, RecipeLike, ordered_images_prefetch
+
+DEFAULT_CHUNK_SIZE = 1000
+RECIPE_FIELDS = (
+    'title', 'category', 'difficulty', 'cuisine', 'servings',
+    'prep_time', 'total_time', 'instructions', 'steps', 'likes',
+)
+NUTRITION_FIELDS = ('calories', 'protein', 'fat', 'sugar', 'fiber', 'carbohydrates')
+
+
+class InvalidExportFilter(ValueError):
+    pass
+
+
+def parse_modified_since(value):
+    """Parse an ISO date or datetime; naive values are taken in the current timezone."""
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+        day = parse_date(value) if moment is None else None
+    except ValueError:
+        moment = day = None
+    if moment is None:
+        if day is None:
+            raise InvalidExportFilter(f"Invalid timestamp {value!r}.")
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_queryset(author=None, category=None, modified_since=None):
+    """
+    Recipes to export, oldest first, optionally restricted to one author
+    (username), one category and recipes changed at or after a moment.
+
+    Likes move ``Recipe.likes`` with ``.update()``, which leaves ``modified``
+    alone, so recipes liked since the moment count as changed too. Unlikes
+    leave no row to find: a recipe whose only change was losing likes is
+    missed until its next edit or a full export.
+    """
+    recipes = Recipe.objects.select_related('author', 'nutrition').prefetch_related(
+        Prefetch('ingredients', queryset=Ingredient.objects.order_by('pk')),
+        ordered_images_prefetch(),
+    )
+    if author:
+        recipes = recipes.filter(author__username=author)
+    if category not in (None, ''):
+        try:
+            category = int(category)
+        except (TypeError, ValueError):
+            category = None
+        if category not in Recipe.CategoryTypes.values:
+            raise InvalidExportFilter(f"Unknown category; expected one of {Recipe.CategoryTypes.values}.")
+        recipes = recipes.filter(category=category)
+    if modified_since:
+        liked = RecipeLike.objects.filter(created__gte=modified_since).values('recipe')
+        recipes = recipes.filter(Q(modified__gte=modified_since) | Q(pk__in=liked))
+    return recipes.order_by('pk')
+
+
+def serialize_recipe(recipe, build_url=str):
+    """Plain dict for one recipe; ``build_url`` turns media URLs into absolute ones."""
+    data = {'id': recipe.pk, 'author': recipe.author.username}
+    data.update({field: getattr(recipe, field) for field in RECIPE_FIELDS})
+    data['created'] = recipe.created
+    data['modified'] = recipe.modified
+
+    nutrition = getattr(recipe, 'nutrition', None)
+    data['nutrition'] = (
+        {field: getattr(nutrition, field) for field in NUTRITION_FIELDS} if nutrition else None
+    )
+    data['ingredients'] = [
+        {
+            'name': ingredient.name,
+            'quantity': ingredient.quantity,
+            'unit': ingredient.unit,
+            'optional': ingredient.optional,
+        }
+        for ingredient in recipe.ingredients.all()
+    ]
+    data['images'] = [
+        {
+            'url': build_url(image.image.url),
+            'renditions': {size: build_url(image.rendition_url(size)) for size in image.renditions},
+        }
+        for image in recipe.ordered_images
+        if image.image
+    ]
+    return data
+
+
+def export_lines(recipes, chunk_size=DEFAULT_CHUNK_SIZE, build_url=str):
+    """Yield one NDJSON line per recipe in ``recipes``."""
+    for recipe in recipes.iterator(chunk_size=chunk_size):
+        yield json.dumps(serialize_recipe(recipe, build_url), cls=DjangoJSONEncoder) + '\n'
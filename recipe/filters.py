@@ -1,5 +1,17 @@
+import hashlib
+import json
+
 import django_filters
+from django.core.cache import cache
+from django.db.models import Count
+
 from .models import Recipe
+from . import caching, pantry
+from . import search as search_index
+
+
+FACET_CUISINES = 10
+FACETS_TIMEOUT = 60 * 10
 
 
 class RecipeFilter(django_filters.FilterSet):
@@ -15,15 +27,106 @@ class RecipeFilter(django_filters.FilterSet):
 
     cuisine = django_filters.CharFilter(
         field_name="cuisine",
-        lookup_expr="icontains"
+        method="filter_cuisine"
     )
 
     search = django_filters.CharFilter(
         field_name="title",
-        lookup_expr="icontains",
+        method="filter_search",
         label="Search"
     )
 
+    ingredients = django_filters.CharFilter(
+        method="filter_ingredients",
+        label="Ingredients"
+    )
+
+    # Ranges take ``<name>_min`` / ``<name>_max`` parameters, e.g. ``?calories_max=500``.
+    calories = django_filters.RangeFilter(field_name="nutrition__calories")
+    protein = django_filters.RangeFilter(field_name="nutrition__protein")
+    fat = django_filters.RangeFilter(field_name="nutrition__fat")
+    sugar = django_filters.RangeFilter(field_name="nutrition__sugar")
+    fiber = django_filters.RangeFilter(field_name="nutrition__fiber")
+    carbohydrates = django_filters.RangeFilter(field_name="nutrition__carbohydrates")
+    prep_time = django_filters.RangeFilter(field_name="prep_time")
+    total_time = django_filters.RangeFilter(field_name="total_time")
+
     class Meta:
         model = Recipe
-        fields = ["category", "difficulty", "cuisine", "search"]
+        fields = [
+            "category", "difficulty", "cuisine", "search", "ingredients",
+            "calories", "protein", "fat", "sugar", "fiber", "carbohydrates",
+            "prep_time", "total_time",
+        ]
+
+    def filter_cuisine(self, queryset, name, value):
+        return search_index.filter_queryset(
+            queryset, value, column="cuisine", fallback_fields=("cuisine",)
+        )
+
+    def filter_search(self, queryset, name, value):
+        """Full-text search over title, cuisine, instructions and ingredients, ranked by BM25."""
+        return search_index.rank_queryset(queryset, value)
+
+    def filter_ingredients(self, queryset, name, value):
+        """Recipes using any of the comma separated ingredients, those using the most first."""
+        return pantry.rank_by_ingredients(queryset, value)
+
+    def facet_cache_key(self):
+        """Cache key from the cleaned filter values, so equivalent queries share an entry."""
+        cleaned_data = self.form.cleaned_data if self.is_bound else {}
+        params = {
+            name: str(value).strip().casefold()
+            for name, value in cleaned_data.items()
+            if value not in (None, '')
+        }
+        digest = hashlib.md5(json.dumps(params, sort_keys=True).encode(), usedforsecurity=False).hexdigest()
+        return caching.namespaced(caching.RECIPE_FACETS_KEY, digest)
+
+    def facets(self):
+        """
+        Per-value counts of category, difficulty and the top cuisines in the
+        filtered set, from one query grouped by all three columns. Cached
+        per normalized filter values until a recipe changes. None when the
+        submitted filters are invalid.
+        """
+        if self.is_bound and not self.is_valid():
+            return None
+        key = self.facet_cache_key()
+        facets = cache.get(key)
+        if facets is None:
+            facets = self.compute_facets()
+            cache.set(key, facets, FACETS_TIMEOUT)
+        return facets
+
+    def compute_facets(self):
+        rows = (
+            self.qs.order_by()
+            .values('category', 'difficulty', 'cuisine')
+            .annotate(count=Count('pk'))
+        )
+        categories, difficulties, cuisines, spellings = {}, {}, {}, {}
+        for row in rows:
+            categories[row['category']] = categories.get(row['category'], 0) + row['count']
+            difficulties[row['difficulty']] = difficulties.get(row['difficulty'], 0) + row['count']
+            cuisine = row['cuisine'].strip()
+            name = cuisine.casefold()
+            cuisines[name] = cuisines.get(name, 0) + row['count']
+            spellings.setdefault(name, cuisine)
+
+        top_cuisines = sorted(cuisines.items(), key=lambda item: (-item[1], item[0]))[:FACET_CUISINES]
+        return {
+            'category': [
+                {'value': value, 'label': label, 'count': categories.get(value, 0)}
+                for value, label in Recipe.CategoryTypes.choices
+            ],
+            'difficulty': [
+                {'value': value, 'label': label, 'count': difficulties.get(value, 0)}
+                for value, label in Recipe.DifficultyLevels.choices
+            ],
+            'cuisine': [
+                {'value': spellings[name], 'label': spellings[name], 'count': count}
+                for name, count in top_cuisines
+                if name
+            ],
+        }
@@ -1,6 +1,6 @@
 from decimal import Decimal
 from django import forms
-from .models import Collection, Ingredient, Recipe, Nutrition, RecipeImage
+from .models import Collection, Ingredient, Recipe, Nutrition
 
 class RecipeForm(forms.ModelForm):
     class Meta:
@@ -46,10 +46,26 @@ class NutritionForm(forms.ModelForm):
             "carbohydrates": forms.NumberInput(attrs={"placeholder": "1 gram"}),
         }
 
-class RecipeImageForm(forms.ModelForm):
-    class Meta:
-        model = RecipeImage
-        fields = ["image"]
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleImageField(forms.ImageField):
+    """An ImageField accepting several uploads; cleans to a list of files."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_file_clean(item, initial) for item in data]
+        return [single_file_clean(data, initial)] if data else []
+
+
+class RecipeImageForm(forms.Form):
+    image = MultipleImageField(required=False)
 
 class IngredientForm(forms.ModelForm):
 
@@ -0,0 +1,146 @@
+"""
+Bulk import of partner recipe catalogues from JSONL or CSV.
+
+Rows are validated with the same forms as the create view, parsed in a
+process pool and written in batches through
+``domains.create_recipes_in_bulk``, one transaction per batch.
+
+A JSONL line is an object with the RecipeForm fields, a ``nutrition``
+object and an ``ingredients`` list. A CSV row has the recipe and
+nutrition fields as columns and ``ingredients`` as a JSON list.
+"""
+import csv
+import json
+from itertools import islice
+
+from .domains import create_recipes_in_bulk
+from .forms import IngredientForm, NutritionForm, RecipeForm
+from .models import Ingredient, Recipe
+
+FORMATS = ('jsonl', 'csv')
+DEFAULT_BATCH_SIZE = 500
+DUPLICATE_TITLE = "You already have a recipe with this title."
+
+
+def read_rows(stream, fmt):
+    """
+    Yield ``(line_number, raw_row)`` pairs from ``stream`` without loading it.
+
+    JSONL rows are yielded undecoded so that decoding happens in the
+    workers; ``line_number`` is the last physical line of the row.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            yield number, line
+
+
+def _form_errors(form, prefix=''):
+    return [
+        f"{prefix}{field}: {message}" if field != '__all__' else f"{prefix}{message}"
+        for field, messages in form.errors.items()
+        for message in messages
+    ]
+
+
+def parse_row(item):
+    """
+    Validate one ``(line_number, raw_row)`` pair.
+
+    Returns ``(line_number, data, errors)`` where ``data`` holds the cleaned
+    ``recipe``, ``nutrition`` and ``ingredients`` values, or None when
+    ``errors`` is not empty. Runs in worker processes, so it must not
+    touch the database.
+    """
+    number, raw = item
+    try:
+        row = json.loads(raw) if isinstance(raw, str) else raw
+        ingredients = row.get('ingredients') or []
+        if isinstance(ingredients, str):
+            ingredients = json.loads(ingredients)
+        nutrition = row.get('nutrition') or row
+    except (AttributeError, ValueError) as exc:
+        return number, None, [f"Malformed row: {exc}"]
+    if not isinstance(ingredients, list) or not isinstance(nutrition, dict):
+        return number, None, ["Malformed row: ingredients must be a list and nutrition an object."]
+
+    recipe_form = RecipeForm(data=row)
+    nutrition_form = NutritionForm(data=nutrition)
+    ingredient_forms = [IngredientForm(data=ingredient) for ingredient in ingredients]
+
+    errors = _form_errors(recipe_form) + _form_errors(nutrition_form)
+    for index, form in enumerate(ingredient_forms):
+        errors += _form_errors(form, prefix=f"ingredients[{index}].")
+    if errors:
+        return number, None, errors
+
+    data = {
+        'recipe': recipe_form.cleaned_data,
+        'nutrition': nutrition_form.cleaned_data,
+        'ingredients': [
+            dict(form.cleaned_data, unit=form.cleaned_data['unit'] or Ingredient.UnitTypes.GRAM)
+            for form in ingredient_forms
+            if form.cleaned_data.get('name')
+        ],
+    }
+    return number, data, []
+
+
+def _batches(items, size):
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _parsed_batches(batches, pool, workers):
+    """
+    Yield each batch parsed, keeping the next one parsing in ``pool``
+    while the caller writes the current one.
+    """
+    if pool is None:
+        for batch in batches:
+            yield [parse_row(item) for item in batch]
+        return
+    pending = None
+    for batch in batches:
+        chunksize = max(1, len(batch) // (workers * 4))
+        parsing = pool.map(parse_row, batch, chunksize=chunksize)
+        if pending is not None:
+            yield list(pending)
+        pending = parsing
+    if pending is not None:
+        yield list(pending)
+
+
+def import_recipes(rows, user, batch_size=DEFAULT_BATCH_SIZE, pool=None, workers=1):
+    """
+    Import ``(line_number, raw_row)`` pairs as recipes owned by ``user``.
+
+    Yields ``(last_line, imported, rejected)`` after each committed batch,
+    where ``rejected`` lists ``(line_number, errors)``. Titles the author
+    already uses are rejected like RecipeForm does, with one query per batch.
+    """
+    for parsed in _parsed_batches(_batches(rows, batch_size), pool, workers):
+        valid = [(number, data) for number, data, errors in parsed if data is not None]
+        rejected = [(number, errors) for number, data, errors in parsed if data is None]
+
+        titles = {data['recipe']['title'] for _, data in valid}
+        taken = set(
+            Recipe.objects.filter(author=user, title__in=titles).values_list('title', flat=True)
+        )
+        accepted = []
+        for number, data in valid:
+            title = data['recipe']['title']
+            if title in taken:
+                rejected.append((number, [f"title: {DUPLICATE_TITLE}"]))
+                continue
+            taken.add(title)
+            accepted.append(data)
+
+        create_recipes_in_bulk(user, accepted)
+        rejected.sort()
+        yield parsed[-1][0], len(accepted), rejected
@@ -0,0 +1,41 @@
+import re
+
+# A period ends a step only when followed by whitespace or the end of the
+# text, so "1.5 cups" and "180.0C" stay inside their step.
+_SENTENCE_END = re.compile(r'(?<=\.)\s+|(?<=[!?])\s+')
+_ENUMERATOR = re.compile(r'^\s*(?:(?:step\s*)?\d+\s*[.):-]|[-*•])\s+', re.IGNORECASE)
+_DURATION = re.compile(
+    r'(?P<low>\d+(?:\.\d+)?)'
+    r'(?:\s*(?:-|–|to)\s*(?P<high>\d+(?:\.\d+)?))?'
+    r'\s*(?P<unit>hours?|hrs?|minutes?|mins?|seconds?|secs?)\b',
+    re.IGNORECASE,
+)
+_UNIT_SECONDS = {'h': 3600, 'm': 60, 's': 1}
+
+
+def _timers(text):
+    timers = []
+    for match in _DURATION.finditer(text):
+        amount = float(match.group('high') or match.group('low'))
+        seconds = int(amount * _UNIT_SECONDS[match.group('unit')[0].lower()])
+        if seconds:
+            timers.append({'label': match.group(0), 'seconds': seconds})
+    return timers
+
+
+def parse_instructions(text):
+    """
+    Split free-text instructions into ordered steps.
+
+    Returns ``[{'text': ..., 'timers': [{'label': '10 minutes', 'seconds': 600}]}]``.
+    Lines are split into sentences; list markers such as "1." or "-" at the
+    start of a line are dropped, decimals are left intact.
+    """
+    steps = []
+    for line in (text or '').splitlines():
+        line = _ENUMERATOR.sub('', line)
+        for sentence in _SENTENCE_END.split(line):
+            sentence = sentence.strip().rstrip('.').strip()
+            if sentence:
+                steps.append({'text': sentence, 'timers': _timers(sentence)})
+    return steps
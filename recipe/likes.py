@@ -0,0 +1,56 @@
+"""
+Which recipes a viewer has liked, resolved for a whole page of cards at once.
+
+A page costs one ``RecipeLike`` query however many cards it shows. With
+``LIKED_RECIPES_CACHE_TIMEOUT`` set, each user's liked ids are cached
+instead; ``toggle_like`` retires the entry (see ``recipe.caching``).
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from . import caching
+
+LIKED_RECIPES_KEY = 'recipes:liked-by'
+
+
+def _namespace(user_pk):
+    return f'{LIKED_RECIPES_KEY}:{user_pk}'
+
+
+def invalidate(user_pk):
+    caching.invalidate(_namespace(user_pk))
+
+
+def _all_liked_ids(user, timeout):
+    from .models import RecipeLike
+
+    key = caching.namespaced(_namespace(user.pk), 'ids')
+    liked = cache.get(key)
+    if liked is None:
+        liked = frozenset(RecipeLike.objects.filter(user=user).values_list('recipe_id', flat=True))
+        cache.set(key, liked, timeout)
+    return liked
+
+
+def liked_ids(user, recipe_ids):
+    """The subset of ``recipe_ids`` that ``user`` likes."""
+    from .models import RecipeLike
+
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids or not user.is_authenticated:
+        return set()
+    timeout = getattr(settings, 'LIKED_RECIPES_CACHE_TIMEOUT', 0)
+    if timeout:
+        return recipe_ids & _all_liked_ids(user, timeout)
+    return set(
+        RecipeLike.objects.filter(user=user, recipe_id__in=recipe_ids).values_list('recipe_id', flat=True)
+    )
+
+
+def mark_liked(recipes, user):
+    """Set ``viewer_liked`` on each of ``recipes``, as the detail page's annotation does; returns a list."""
+    recipes = list(recipes)
+    liked = liked_ids(user, (recipe.pk for recipe in recipes))
+    for recipe in recipes:
+        recipe.viewer_liked = recipe.pk in liked
+    return recipes
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipe.models import Recipe, RecipeImage
+
+
+class Command(BaseCommand):
+    help = "Populate Recipe.cover_image and Recipe.second_image from existing RecipeImage rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipes = Recipe.objects.only('id', 'cover_image', 'second_image').order_by('pk')
+        last_pk = 0
+        changed = 0
+        while True:
+            batch = list(recipes.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            ordered = {}
+            for recipe_id, image_id in (
+                RecipeImage.objects.filter(recipe__in=batch)
+                .order_by('recipe_id', 'created', 'id')
+                .values_list('recipe_id', 'id')
+            ):
+                ordered.setdefault(recipe_id, []).append(image_id)
+
+            stale = []
+            for recipe in batch:
+                image_ids = ordered.get(recipe.pk, [])[:2]
+                image_ids += [None] * (2 - len(image_ids))
+                if (recipe.cover_image_id, recipe.second_image_id) != tuple(image_ids):
+                    recipe.cover_image_id, recipe.second_image_id = image_ids
+                    stale.append(recipe)
+
+            with transaction.atomic():
+                Recipe.objects.bulk_update(stale, ['cover_image', 'second_image'])
+            changed += len(stale)
+
+        self.stdout.write(self.style.SUCCESS(f"Updated cover images of {changed} recipes."))
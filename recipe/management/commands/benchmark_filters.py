@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from recipe.benchmarking import seed_recipes, time_call
+from recipe.filters import RecipeFilter
+from recipe.models import Recipe
+
+PAGE_SIZE = 12
+SCENARIOS = {
+    'under 500 calories': {'calories_max': '500'},
+    'at least 30g protein': {'protein_min': '30'},
+    'ready in 90 minutes': {'total_time_max': '90'},
+    'light and quick': {'calories_max': '300', 'total_time_max': '90'},
+}
+
+
+class Command(BaseCommand):
+    help = "Time the nutrition and time range filters and show the query plans they use."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help="Insert this many synthetic recipes before measuring.",
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.stdout.write(f"Seeded {seed_recipes(options['seed'])} recipes.")
+
+        recipes = Recipe.objects.select_related('cover_image', 'nutrition').order_by('-created')
+        self.stdout.write(f"{Recipe.objects.count()} recipes, {options['repeat']} runs per filter")
+        for name, params in SCENARIOS.items():
+            queryset = RecipeFilter(params, queryset=recipes).qs
+
+            def run():
+                queryset.count()
+                list(queryset[:PAGE_SIZE])
+
+            median, p95 = time_call(run, options['repeat'])
+            self.stdout.write(f"{name:>22}  median {median:8.2f}ms p95 {p95:8.2f}ms")
+            self.write_plan('count', queryset.order_by())
+            self.write_plan('page', queryset[:PAGE_SIZE])
+
+    def write_plan(self, label, queryset):
+        for line in queryset.explain().splitlines():
+            self.stdout.write(f"{label:>28}  {line}")
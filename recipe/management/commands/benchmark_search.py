@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from recipe import search
+from recipe.benchmarking import seed_recipes, time_call
+from recipe.filters import RecipeFilter
+from recipe.models import Recipe
+
+PAGE_SIZE = 12
+
+
+class Command(BaseCommand):
+    help = "Compare recipe search latency of the FTS5 index against icontains filtering."
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', default=['tomato', 'garlic paneer', 'chick'])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help="Insert this many synthetic recipes (and reindex) before measuring.",
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seeded = seed_recipes(options['seed'])
+            search.rebuild_index()
+            self.stdout.write(f"Seeded {seeded} recipes.")
+
+        if not search.is_available():
+            self.stdout.write(self.style.WARNING(
+                "Search index unavailable; the indexed path uses the icontains fallback."
+            ))
+
+        self.stdout.write(f"{Recipe.objects.count()} recipes, {options['repeat']} runs per query")
+        for query in options['queries']:
+            def icontains():
+                qs = Recipe.objects.filter(title__icontains=query).order_by('-created')
+                qs.count()
+                list(qs[:PAGE_SIZE])
+
+            def indexed():
+                qs = RecipeFilter({'search': query}, queryset=Recipe.objects.order_by('-created')).qs
+                qs.count()
+                list(qs[:PAGE_SIZE])
+
+            old_median, old_p95 = time_call(icontains, options['repeat'])
+            new_median, new_p95 = time_call(indexed, options['repeat'])
+            self.stdout.write(
+                f"{query!r:>20}  icontains median {old_median:8.2f}ms p95 {old_p95:8.2f}ms  |  "
+                f"fts median {new_median:8.2f}ms p95 {new_p95:8.2f}ms"
+            )
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import exporting
+
+
+class Command(BaseCommand):
+    help = "Write recipes with nutrition, ingredients and image URLs as NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help="File to write; standard output by default.")
+        parser.add_argument('--author', default=None, help="Only export recipes of this username.")
+        parser.add_argument('--category', default=None, help="Only export recipes of this category value.")
+        parser.add_argument('--modified-since', default=None,
+                            help="Only export recipes modified or liked at or after this ISO date or datetime.")
+        parser.add_argument('--chunk-size', type=int, default=exporting.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--base-url', default='',
+                            help="Prefix for media URLs, e.g. https://tastora.example.")
+
+    def handle(self, *args, **options):
+        try:
+            recipes = exporting.export_queryset(
+                author=options['author'],
+                category=options['category'],
+                modified_since=exporting.parse_modified_since(options['modified_since']),
+            )
+        except exporting.InvalidExportFilter as exc:
+            raise CommandError(str(exc))
+
+        base_url = options['base_url'].rstrip('/')
+        lines = exporting.export_lines(
+            recipes, chunk_size=options['chunk_size'], build_url=lambda url: f'{base_url}{url}',
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                count = self.write_lines(output.write, lines)
+        else:
+            count = self.write_lines(lambda line: self.stdout.write(line, ending=''), lines)
+        # Standard output may carry the export itself, so report on stderr.
+        self.stderr.write(f"Exported {count} recipes.")
+
+    def write_lines(self, write, lines):
+        count = 0
+        for line in lines:
+            write(line)
+            count += 1
+        return count
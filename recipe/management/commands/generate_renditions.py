@@ -0,0 +1,56 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from recipe.models import Profile, RecipeImage
+from recipe.renditions import render_renditions
+
+
+def _render(job):
+    pk, name = job
+    return pk, render_renditions(name)
+
+
+class Command(BaseCommand):
+    help = "Backfill thumb/card/hero renditions for recipe images and profile pictures."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Size of the process pool.")
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Regenerate renditions that already exist.",
+        )
+
+    def handle(self, *args, **options):
+        # Worker processes must not inherit open database connections.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            for model, field in ((RecipeImage, 'image'), (Profile, 'profile_picture')):
+                done = self.backfill(pool, model, field, options['batch_size'], options['force'])
+                self.stdout.write(f"{model.__name__}: rendered {done} images.")
+        self.stdout.write(self.style.SUCCESS("Renditions are up to date."))
+
+    def backfill(self, pool, model, field, batch_size, force):
+        queryset = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        if not force:
+            queryset = queryset.filter(renditions={})
+        queryset = queryset.order_by('pk').values_list('pk', field)
+
+        done = 0
+        last_pk = 0
+        while True:
+            jobs = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not jobs:
+                break
+            last_pk = jobs[-1][0]
+            results = [
+                model(pk=pk, renditions=renditions)
+                for pk, renditions in pool.map(_render, jobs)
+            ]
+            with transaction.atomic():
+                model.objects.bulk_update(results, ['renditions'])
+            done += sum(1 for result in results if result.renditions)
+        return done
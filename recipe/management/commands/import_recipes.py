@@ -0,0 +1,98 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from recipe import importing
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream recipes from a JSONL or CSV file into the database, validating "
+        "rows with the recipe forms and writing them in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSONL or CSV file to import.")
+        parser.add_argument('--author', required=True, help="Username that will own the imported recipes.")
+        parser.add_argument('--format', choices=importing.FORMATS, default=None,
+                            help="Input format; guessed from the file extension by default.")
+        parser.add_argument('--batch-size', type=int, default=importing.DEFAULT_BATCH_SIZE,
+                            help="Rows written per transaction.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Size of the parsing process pool; 0 parses in this process.")
+        parser.add_argument('--checkpoint', default=None,
+                            help="File recording the last committed line; an existing one resumes the import.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        try:
+            user = get_user_model().objects.get(username=options['author'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user named {options['author']!r}.")
+
+        resume_after = self.read_checkpoint(options['checkpoint'])
+        if resume_after:
+            self.stdout.write(f"Resuming after line {resume_after}.")
+
+        workers = options['workers'] if options['workers'] is not None else os.cpu_count() or 1
+        if workers:
+            # Worker processes must not inherit open database connections.
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+        else:
+            pool = nullcontext()
+
+        imported = rejected = 0
+        started = time.perf_counter()
+        with open(path, newline='', encoding='utf-8') as stream, pool:
+            rows = (
+                (number, row) for number, row in importing.read_rows(stream, fmt)
+                if number > resume_after
+            )
+            batches = importing.import_recipes(
+                rows, user,
+                batch_size=options['batch_size'],
+                pool=pool if workers else None,
+                workers=workers,
+            )
+            for last_line, count, errors in batches:
+                imported += count
+                rejected += len(errors)
+                for number, messages in errors:
+                    self.stderr.write(f"Line {number}: {'; '.join(messages)}")
+                self.write_checkpoint(options['checkpoint'], last_line)
+                self.stdout.write(
+                    f"Line {last_line}: {imported} imported, {rejected} rejected "
+                    f"({self.rate(imported + rejected, started):.0f} rows/s)."
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} recipes, rejected {rejected} rows "
+            f"in {time.perf_counter() - started:.1f}s "
+            f"({self.rate(imported + rejected, started):.0f} rows/s)."
+        ))
+
+    def rate(self, rows, started):
+        return rows / max(time.perf_counter() - started, 1e-9)
+
+    def read_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path, encoding='utf-8') as checkpoint:
+            return json.load(checkpoint)['line']
+
+    def write_checkpoint(self, path, line):
+        if not path:
+            return
+        # Write then rename so a crash never leaves a truncated checkpoint.
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as checkpoint:
+            json.dump({'line': line}, checkpoint)
+        os.replace(f'{path}.tmp', path)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipe import pantry
+
+
+class Command(BaseCommand):
+    help = "Rebuild the canonical ingredient index used by ingredient searches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = pantry.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed ingredients of {total} recipes."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text recipe search index from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError(
+                "The search index is not available on this database; "
+                "searches fall back to icontains filtering."
+            )
+        total = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} recipes."))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from recipe.models import Recipe, RecipeLike
+
+
+class Command(BaseCommand):
+    help = "Repair Recipe.likes wherever it drifted from the number of RecipeLike rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        actual_likes = Coalesce(
+            Subquery(
+                RecipeLike.objects.filter(recipe=OuterRef('pk'))
+                .order_by()
+                .values('recipe')
+                .annotate(total=Count('pk'))
+                .values('total'),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        )
+
+        repaired = 0
+        last_pk = 0
+        max_pk = Recipe.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        while last_pk < max_pk:
+            upper = last_pk + batch_size
+            with transaction.atomic():
+                repaired += (
+                    Recipe.objects.filter(pk__gt=last_pk, pk__lte=upper)
+                    .alias(actual=actual_likes)
+                    .exclude(likes=F('actual'))
+                    .update(likes=actual_likes)
+                )
+            last_pk = upper
+
+        self.stdout.write(self.style.SUCCESS(f"Repaired like counts of {repaired} recipes."))
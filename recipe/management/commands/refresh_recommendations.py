@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipe import recommendations
+
+JOBS = {
+    'similar': ("Similar recipes", recommendations.refresh_similar, recommendations.SIMILAR_TOP_K),
+    'co_liked': ("Co-liked recipes", recommendations.refresh_co_liked, recommendations.CO_LIKED_TOP_K),
+}
+
+
+class Command(BaseCommand):
+    help = "Recompute stored recipe neighbours, incrementally unless --full is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=[*JOBS, 'all'], default='all')
+        parser.add_argument('--full', action='store_true', help="Rescore every recipe, not only changed ones.")
+        parser.add_argument('--top-k', type=int, default=None, help="Neighbours kept per recipe.")
+        parser.add_argument('--batch-size', type=int, default=recommendations.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        kinds = list(JOBS) if options['kind'] == 'all' else [options['kind']]
+        for kind in kinds:
+            label, refresh, top_k = JOBS[kind]
+            rescored, written = refresh(
+                full=options['full'], top_k=options['top_k'] or top_k, batch_size=options['batch_size'],
+            )
+            self.stdout.write(self.style.SUCCESS(f"{label}: rescored {rescored} recipes, stored {written} rows."))
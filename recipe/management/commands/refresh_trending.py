@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipe import trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute trending scores from recent likes and drop recipes whose "
+        "likes have decayed away. Run periodically, e.g. hourly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        remaining = trending.recompute(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{remaining} recipes are trending."))
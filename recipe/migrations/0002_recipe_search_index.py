@@ -0,0 +1,70 @@
+from django.db import OperationalError, migrations
+
+# Frozen copies of recipe.search helpers, so later changes to that module
+# cannot alter what this migration does.
+SEARCH_TABLE = 'recipe_search'
+SEARCH_COLUMNS = ('title', 'cuisine', 'instructions', 'ingredients')
+BATCH_SIZE = 1000
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+                f"USING fts5({', '.join(SEARCH_COLUMNS)}, tokenize='porter unicode61')"
+            )
+        except OperationalError:
+            # SQLite compiled without FTS5: search falls back to icontains.
+            pass
+
+
+def populate_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite' or SEARCH_TABLE not in connection.introspection.table_names():
+        return
+    Recipe = apps.get_model('recipe', 'Recipe')
+    Ingredient = apps.get_model('recipe', 'Ingredient')
+
+    recipes = Recipe.objects.only('id', 'title', 'cuisine', 'instructions').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(recipes.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        names = {}
+        for recipe_id, name in (
+            Ingredient.objects.filter(recipe__in=batch).values_list('recipe_id', 'name')
+        ):
+            names.setdefault(recipe_id, []).append(name)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(SEARCH_COLUMNS)}) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [
+                    (r.pk, r.title, r.cuisine, r.instructions, ' '.join(names.get(r.pk, [])))
+                    for r in batch
+                ],
+            )
+        last_pk = batch[-1].pk
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(populate_index, migrations.RunPython.noop),
+    ]
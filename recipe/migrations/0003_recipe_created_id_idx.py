@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0002_recipe_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-created', '-id'], name='recipe_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0003_recipe_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cover_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='recipe.recipeimage'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='second_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='recipe.recipeimage'),
+        ),
+    ]
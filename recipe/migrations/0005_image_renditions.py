@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0004_recipe_cover_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipeimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0005_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeTrend',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='recipe.recipe')),
+                ('score', models.FloatField(db_index=True, default=0)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ('-score',),
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:23
+
+import re
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+# Frozen copy of recipe.instructions.parse_instructions as of this migration.
+_SENTENCE_END = re.compile(r'(?<=\.)\s+|(?<=[!?])\s+')
+_ENUMERATOR = re.compile(r'^\s*(?:(?:step\s*)?\d+\s*[.):-]|[-*•])\s+', re.IGNORECASE)
+_DURATION = re.compile(
+    r'(?P<low>\d+(?:\.\d+)?)'
+    r'(?:\s*(?:-|–|to)\s*(?P<high>\d+(?:\.\d+)?))?'
+    r'\s*(?P<unit>hours?|hrs?|minutes?|mins?|seconds?|secs?)\b',
+    re.IGNORECASE,
+)
+_UNIT_SECONDS = {'h': 3600, 'm': 60, 's': 1}
+
+
+def _timers(text):
+    timers = []
+    for match in _DURATION.finditer(text):
+        amount = float(match.group('high') or match.group('low'))
+        seconds = int(amount * _UNIT_SECONDS[match.group('unit')[0].lower()])
+        if seconds:
+            timers.append({'label': match.group(0), 'seconds': seconds})
+    return timers
+
+
+def parse_instructions(text):
+    steps = []
+    for line in (text or '').splitlines():
+        line = _ENUMERATOR.sub('', line)
+        for sentence in _SENTENCE_END.split(line):
+            sentence = sentence.strip().rstrip('.').strip()
+            if sentence:
+                steps.append({'text': sentence, 'timers': _timers(sentence)})
+    return steps
+
+
+def backfill_steps(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    recipes = Recipe.objects.only('id', 'instructions').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(recipes.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        for recipe in batch:
+            recipe.steps = parse_instructions(recipe.instructions)
+        Recipe.objects.bulk_update(batch, ['steps'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0006_recipe_trend'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='steps',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(backfill_steps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:32
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+# Frozen copy of the recipe.pantry term rules as of this migration.
+MAX_TERM_WORDS = 3
+MAX_TERM_LENGTH = 100
+_WORD_RE = re.compile(r'[^\W\d_]+', re.UNICODE)
+_NOT_PLURAL = ('ss', 'us', 'is', 'ous')
+_ES_PLURAL = ('ches', 'shes', 'sses', 'xes', 'zes', 'oes')
+
+
+def singular(word):
+    if len(word) <= 3 or word.endswith(_NOT_PLURAL):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(_ES_PLURAL):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def terms_for(name):
+    words = [singular(word) for word in _WORD_RE.findall((name or '').casefold())]
+    terms = set()
+    for start in range(len(words)):
+        for end in range(start + 1, min(start + MAX_TERM_WORDS, len(words)) + 1):
+            terms.add(' '.join(words[start:end])[:MAX_TERM_LENGTH])
+    return terms
+
+
+def populate_terms(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    Ingredient = apps.get_model('recipe', 'Ingredient')
+    IngredientTerm = apps.get_model('recipe', 'IngredientTerm')
+    last_pk = 0
+    while True:
+        recipe_ids = list(
+            Recipe.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not recipe_ids:
+            break
+        terms = set()
+        for recipe_id, name in (
+            Ingredient.objects.filter(recipe_id__in=recipe_ids).values_list('recipe_id', 'name')
+        ):
+            terms.update((recipe_id, term) for term in terms_for(name))
+        IngredientTerm.objects.bulk_create(
+            [IngredientTerm(recipe_id=recipe_id, term=term) for recipe_id, term in sorted(terms)],
+            batch_size=1000,
+        )
+        last_pk = recipe_ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0007_recipe_steps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_terms', to='recipe.recipe')),
+            ],
+            options={
+                'unique_together': {('term', 'recipe')},
+            },
+        ),
+        migrations.RunPython(populate_terms, migrations.RunPython.noop),
+    ]
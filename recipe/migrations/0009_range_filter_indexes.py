@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0008_ingredient_terms'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='nutrition',
+            index=models.Index(fields=['calories'], name='nutrition_calories_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nutrition',
+            index=models.Index(fields=['protein'], name='nutrition_protein_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nutrition',
+            index=models.Index(fields=['fat'], name='nutrition_fat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nutrition',
+            index=models.Index(fields=['sugar'], name='nutrition_sugar_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nutrition',
+            index=models.Index(fields=['fiber'], name='nutrition_fiber_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nutrition',
+            index=models.Index(fields=['carbohydrates'], name='nutrition_carbohydrates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['total_time'], name='recipe_total_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['prep_time'], name='recipe_prep_time_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0009_range_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=100, unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('last_searched', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-count'], name='search_query_count_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0010_search_query_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommenderRun',
+            fields=[
+                ('kind', models.CharField(choices=[('similar', 'Similar ingredients')], max_length=20, primary_key=True, serialize=False)),
+                ('started', models.DateTimeField()),
+                ('finished', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RelatedRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('similar', 'Similar ingredients')], max_length=20)),
+                ('score', models.FloatField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='recipe.recipe')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipe.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recipe', 'kind', '-score'], name='related_recipe_lookup_idx')],
+                'unique_together': {('recipe', 'kind', 'related')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0011_related_recipes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recommenderrun',
+            name='kind',
+            field=models.CharField(choices=[('similar', 'Similar ingredients'), ('co_liked', 'Liked by the same people')], max_length=20, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='relatedrecipe',
+            name='kind',
+            field=models.CharField(choices=[('similar', 'Similar ingredients'), ('co_liked', 'Liked by the same people')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0012_co_liked_recipes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendScale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('halvings', models.FloatField(default=0)),
+            ],
+        ),
+    ]
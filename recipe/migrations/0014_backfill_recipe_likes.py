@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_likes(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    RecipeLike = apps.get_model('recipe', 'RecipeLike')
+    Recipe.objects.update(likes=Coalesce(
+        Subquery(
+            RecipeLike.objects.filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0013_trend_scale'),
+    ]
+
+    operations = [
+        migrations.RunPython(count_likes, migrations.RunPython.noop),
+    ]
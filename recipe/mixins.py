@@ -1,3 +1,8 @@
+import shutil
+import tempfile
+
+from django.test import override_settings
+
 from .factories import (
     UserFactory, 
     RecipeFactory, 
@@ -27,4 +32,15 @@ class RecipeTestDataMixin:
         return self._create_entity(IngredientFactory, callback, **kwargs)
 
     def create_test_image(self, callback=None, **kwargs):
-        return self._create_entity(RecipeImageFactory, callback, **kwargs)
\ No newline at end of file
+        return self._create_entity(RecipeImageFactory, callback, **kwargs)
+
+
+class TemporaryMediaMixin:
+    """Point MEDIA_ROOT at a fresh directory for the test class and delete it afterwards."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media_root))
@@ -1,11 +1,99 @@
-from django.db import models
+from functools import partial
+
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.urls import reverse
 from django_extensions.db.models import TimeStampedModel
+
+from .instructions import parse_instructions
+from .renditions import delete_renditions, is_renderable, refresh_in_background
 import os
 
-class Profile(TimeStampedModel):
+ORDERED_IMAGES_ATTR = 'ordered_images'
+
+
+def ordered_images_prefetch():
+    """
+    Prefetch a recipe's images oldest first into ``recipe.ordered_images``.
+
+    The image accessors on Recipe serve from this list instead of querying.
+    """
+    return models.Prefetch(
+        'images',
+        queryset=RecipeImage.objects.order_by('created', 'id'),
+        to_attr=ORDERED_IMAGES_ATTR,
+    )
+
+
+class RenditionMixin(models.Model):
+    """
+    Resized WebP/JPEG copies of an uploaded image, generated by
+    ``recipe.renditions`` and stored next to the original file.
+
+    Saving a new or replaced source file (forms, admin, shell) drops the
+    old renditions, so pages serve the original until the new ones are
+    rendered in the background.
+    """
+    rendition_source_field = None
+
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if cls.rendition_source_field in field_names:
+            instance._stored_source = instance._source_name()
+        return instance
+
+    def _source_name(self):
+        source = getattr(self, self.rendition_source_field)
+        return source.name if source else ''
+
+    def save(self, *args, **kwargs):
+        if self.rendition_source_field in self.get_deferred_fields():
+            return super().save(*args, **kwargs)
+        source = self._source_name()
+        replaced = getattr(self, '_stored_source', None) != source
+        stale = self.renditions if replaced else None
+        if stale:
+            self.renditions = {}
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'renditions'}
+        super().save(*args, **kwargs)
+        # Uploads only get their final ``upload_to`` name during the save.
+        source = self._stored_source = self._source_name()
+        if stale:
+            storage = getattr(self, self.rendition_source_field).storage
+            transaction.on_commit(partial(delete_renditions, stale, storage))
+        if replaced and is_renderable(source):
+            refresh_in_background(self)
+
+    def rendition_url(self, size, fmt='jpeg'):
+        """URL of a single rendition, falling back to the original image."""
+        name = (self.renditions or {}).get(size, {}).get(fmt)
+        source = getattr(self, self.rendition_source_field)
+        if name:
+            return source.storage.url(name)
+        return source.url if source else ''
+
+    def srcset(self, fmt='webp'):
+        """``srcset`` attribute value listing every rendition width of ``fmt``."""
+        if not self.renditions:
+            return ''
+        storage = getattr(self, self.rendition_source_field).storage
+        candidates = {}
+        for entry in self.renditions.values():
+            if entry.get(fmt):
+                candidates.setdefault(entry['width'], storage.url(entry[fmt]))
+        return ', '.join(f"{url} {width}w" for width, url in sorted(candidates.items()))
+
+
+class Profile(TimeStampedModel, RenditionMixin):
     def user_profile_upload(instance, filename):
         return f"profile/{instance.user.id}/{filename}"
 
@@ -23,6 +111,8 @@ class Profile(TimeStampedModel):
     bio = models.CharField(max_length=1000, blank=True)
     location = models.CharField(max_length=100, blank=True)
 
+    rendition_source_field = 'profile_picture'
+
     def __str__(self):
         return str(self.user)
 
@@ -32,6 +122,47 @@ class Profile(TimeStampedModel):
         return f"{settings.MEDIA_URL}default-recipe.jpg"
 
 
+class RecipeQuerySet(models.QuerySet):
+    """
+    Named shapes for the pages that list or show recipes, so each view loads
+    what its templates read in a fixed number of queries.
+
+    ``likes`` and ``cover_image`` are kept up to date on the row itself, so
+    cards get the like count and cover by column and join, not annotation.
+    """
+    # Columns a recipe card reads, plus ``created`` for ordering and cursors.
+    CARD_FIELDS = (
+        'title', 'author', 'category', 'difficulty', 'cuisine', 'prep_time', 'total_time',
+        'likes', 'featured', 'created', 'modified', 'cover_image',
+    )
+
+    def for_cards(self, *related):
+        """
+        Card columns only (never the instructions or steps) with the cover
+        image joined; ``related`` adds one-to-one joins such as ``'nutrition'``.
+        """
+        return self.select_related('cover_image', *related).only(*self.CARD_FIELDS, *related)
+
+    def for_detail(self, user=None):
+        """
+        Everything the detail page renders: author, profile and nutrition by
+        join, ordered images and ingredients by prefetch, and ``viewer_liked``.
+        """
+        queryset = self.select_related('author__profile', 'nutrition').prefetch_related(
+            ordered_images_prefetch(),
+            models.Prefetch('ingredients', queryset=Ingredient.objects.order_by('pk')),
+        )
+        if user is not None and user.is_authenticated:
+            return queryset.annotate(
+                viewer_liked=models.Exists(RecipeLike.objects.filter(recipe=models.OuterRef('pk'), user=user))
+            )
+        return queryset.annotate(viewer_liked=models.Value(False))
+
+    def for_admin(self):
+        """The admin change list: author and cover thumbnail by join."""
+        return self.select_related('author', 'cover_image')
+
+
 class Recipe(TimeStampedModel):
     class CategoryTypes(models.IntegerChoices):
         VEG = 0, "Veg"
@@ -52,8 +183,25 @@ class Recipe(TimeStampedModel):
     prep_time = models.PositiveIntegerField()
     total_time = models.PositiveIntegerField(validators=[MaxValueValidator(300), MinValueValidator(5)])
     instructions = models.TextField()
+    steps = models.JSONField(default=list, blank=True, editable=False)
     featured = models.BooleanField(default=False)
     likes = models.PositiveIntegerField(default=0)
+    cover_image = models.ForeignKey(
+        'RecipeImage',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    second_image = models.ForeignKey(
+        'RecipeImage',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        editable=False,
+    )
     liked_by = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
         through='RecipeLike',
@@ -61,10 +209,17 @@ class Recipe(TimeStampedModel):
         blank=True
     )
 
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         ordering = ("-created", "title")
         unique_together = ('title', 'author')
         verbose_name_plural = 'Recipes'
+        indexes = [
+            models.Index(fields=['-created', '-id'], name='recipe_created_id_idx'),
+            models.Index(fields=['total_time'], name='recipe_total_time_idx'),
+            models.Index(fields=['prep_time'], name='recipe_prep_time_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -72,26 +227,83 @@ class Recipe(TimeStampedModel):
     def default_recipe_image_url(self):
         return f"{settings.MEDIA_URL}default-recipe.jpg"
 
-    def get_first_image_url(self):
-        latest_image = self.images.order_by('created').first()
-        if latest_image and latest_image.image:
-            return latest_image.image.url
+    def _prefetched_images(self):
+        """Images loaded by ``ordered_images_prefetch()``, or None when not prefetched."""
+        return getattr(self, ORDERED_IMAGES_ATTR, None)
+
+    def _image_url(self, image):
+        if image and image.image:
+            return image.image.url
         return self.default_recipe_image_url()
-    
-    
+
+    def _first_image(self):
+        images = self._prefetched_images()
+        if images is not None:
+            return images[0] if images else None
+        return self.cover_image
+
+    def get_first_image_url(self, size=None):
+        image = self._first_image()
+        if size and image and image.image:
+            return image.rendition_url(size)
+        return self._image_url(image)
+
+    def get_first_image_card_url(self):
+        return self.get_first_image_url('card')
+
+    def get_first_image_srcset(self):
+        image = self._first_image()
+        return image.srcset() if image and image.image else ''
+
     def get_second_image_url(self):
-        images = self.images.order_by('created')
-        if images.count() > 1 and images[1].image:
-            return images[1].image.url
-        return self.default_recipe_image_url()
+        images = self._prefetched_images()
+        if images is not None:
+            return self._image_url(images[1] if len(images) > 1 else None)
+        return self._image_url(self.second_image)
+
+    def refresh_cover_images(self):
+        """
+        Point cover_image/second_image at the two oldest images.
+
+        Called by the RecipeImage save/delete signals, and by the domain
+        functions after bulk inserts (which send no signals), so that cards
+        can render the cover through select_related instead of querying.
+        """
+        image_ids = list(
+            self.images.order_by('created', 'id').values_list('id', flat=True)[:2]
+        )
+        image_ids += [None] * (2 - len(image_ids))
+        self.cover_image_id, self.second_image_id = image_ids
+        Recipe.objects.filter(pk=self.pk).update(
+            cover_image_id=self.cover_image_id,
+            second_image_id=self.second_image_id,
+        )
 
     def get_remaining_image(self):
-        images = self.images.order_by('created')[2:]
-        return images if images.exists() else None
+        images = self._prefetched_images()
+        if images is None:
+            images = list(self.images.order_by('created', 'id')[2:])
+        else:
+            images = images[2:]
+        return images or None
 
     def get_absolute_url(self):
         return reverse('recipe:recipe_detail', kwargs={'pk': self.pk})
 
+    def save(self, *args, **kwargs):
+        # Every write path (forms, admin, shell) keeps the parsed steps current.
+        self.steps = parse_instructions(self.instructions)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'instructions' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'steps'}
+        super().save(*args, **kwargs)
+
+    def get_steps(self):
+        """Steps parsed at save time, parsing on the fly for rows written by bulk or ``update()`` calls."""
+        if self.steps or not self.instructions:
+            return self.steps
+        return parse_instructions(self.instructions)
+
     def is_liked_by_user(self, user):
         return self.liked_by.filter(pk=user.pk).exists()
 
@@ -108,6 +320,36 @@ class RecipeLike(TimeStampedModel):
         return f"{self.user} liked {self.recipe}"
 
 
+class RecipeTrend(models.Model):
+    """
+    Materialized popularity of a recipe, maintained by ``recipe.trending``.
+
+    ``score`` is a forward-decayed sum of likes, so ordering by it ranks
+    recipes by time-decayed popularity without rewriting every row.
+    """
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, primary_key=True, related_name='trend')
+    score = models.FloatField(default=0, db_index=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ('-score',)
+
+    def __str__(self):
+        return f"Trend of {self.recipe_id}: {self.score}"
+
+
+class TrendScale(models.Model):
+    """
+    The single row holding the scale of ``RecipeTrend.score``: stored scores
+    are divided by ``2 ** halvings``, which ``recipe.trending.recompute()``
+    moves forward so like weights never approach float overflow.
+    """
+    halvings = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"Trend scores scaled by 2 ** -{self.halvings}"
+
+
 class Nutrition(models.Model):
     recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, related_name='nutrition')
     calories = models.PositiveIntegerField()
@@ -117,6 +359,17 @@ class Nutrition(models.Model):
     fiber = models.PositiveIntegerField()
     carbohydrates = models.PositiveIntegerField()
 
+    class Meta:
+        # Back the RecipeFilter range filters.
+        indexes = [
+            models.Index(fields=['calories'], name='nutrition_calories_idx'),
+            models.Index(fields=['protein'], name='nutrition_protein_idx'),
+            models.Index(fields=['fat'], name='nutrition_fat_idx'),
+            models.Index(fields=['sugar'], name='nutrition_sugar_idx'),
+            models.Index(fields=['fiber'], name='nutrition_fiber_idx'),
+            models.Index(fields=['carbohydrates'], name='nutrition_carbohydrates_idx'),
+        ]
+
     def __str__(self):
         return f'Nutrition of {self.recipe}'
 
@@ -140,6 +393,71 @@ class Ingredient(models.Model):
         return self.name
 
 
+class IngredientTerm(models.Model):
+    """
+    One canonical ingredient term used by a recipe, maintained by
+    ``recipe.pantry`` so ingredient searches hit an index instead of
+    scanning ``Ingredient.name``.
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ingredient_terms')
+    term = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ('term', 'recipe')
+
+    def __str__(self):
+        return self.term
+
+
+class RelatedRecipe(models.Model):
+    """
+    A precomputed neighbour of a recipe, written offline by
+    ``recipe.recommendations`` so pages can read it with one indexed query.
+    """
+    class Kinds(models.TextChoices):
+        SIMILAR = 'similar', 'Similar ingredients'
+        CO_LIKED = 'co_liked', 'Liked by the same people'
+
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=20, choices=Kinds.choices)
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('recipe', 'kind', 'related')
+        indexes = [
+            models.Index(fields=['recipe', 'kind', '-score'], name='related_recipe_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.related_id} is {self.kind} to {self.recipe_id}"
+
+
+class RecommenderRun(models.Model):
+    """When a ``RelatedRecipe`` kind was last refreshed; the watermark for incremental runs."""
+    kind = models.CharField(max_length=20, primary_key=True, choices=RelatedRecipe.Kinds.choices)
+    started = models.DateTimeField()
+    finished = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.kind} refreshed at {self.finished}"
+
+
+class SearchQuery(models.Model):
+    """How often a normalized search was run; feeds autocomplete suggestions."""
+    query = models.CharField(max_length=100, unique=True)
+    count = models.PositiveIntegerField(default=0)
+    last_searched = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-count'], name='search_query_count_idx'),
+        ]
+
+    def __str__(self):
+        return self.query
+
+
 class Collection(TimeStampedModel):
     title = models.CharField(max_length=200)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='collections')
@@ -153,7 +471,7 @@ class Collection(TimeStampedModel):
         return self.title
 
 
-class RecipeImage(TimeStampedModel):
+class RecipeImage(TimeStampedModel, RenditionMixin):
     def recipe_image_upload(instance, filename):
         return f"recipes/{instance.recipe.id}/{filename}"
 
@@ -165,6 +483,8 @@ class RecipeImage(TimeStampedModel):
         null=True
     )
 
+    rendition_source_field = 'image'
+
     class Meta:
         ordering = ('-created',)
 
@@ -0,0 +1,147 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+NEXT = 'n'
+PREVIOUS = 'p'
+# Used when the queryset has no explicit ordering of its own.
+DEFAULT_ORDERING = ('-created',)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def keyset(queryset):
+    """
+    The ordering a cursor seeks on: the queryset's own ``order_by`` (e.g. a
+    search rank, then ``-created``) with ``-pk`` appended as tie-breaker.
+
+    Only plain field and annotation names are supported, and none of them
+    may be NULL.
+    """
+    ordering = [
+        name for name in (queryset.query.order_by or DEFAULT_ORDERING)
+        if name.lstrip('-') not in ('pk', 'id')
+    ]
+    return (*ordering, '-pk')
+
+
+def _dump(value):
+    # isoformat keeps microseconds, which the seek must compare exactly.
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _load(model, name, value):
+    try:
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+    except FieldDoesNotExist:
+        # An annotation such as a rank: JSON already restored its number.
+        return value
+    return field.to_python(value)
+
+
+def encode_cursor(obj, ordering, direction):
+    values = [_dump(getattr(obj, name.lstrip('-'))) for name in ordering]
+    raw = json.dumps({'k': values, 'd': direction}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, ordering):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values, direction = payload['k'], payload['d']
+        if len(values) != len(ordering) or direction not in (NEXT, PREVIOUS):
+            raise ValueError(cursor)
+        values = [_load(model, name.lstrip('-'), value) for name, value in zip(ordering, values)]
+    except (binascii.Error, ValidationError, ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursor(cursor) from exc
+    return values, direction
+
+
+def _seek(ordering, values, forward):
+    """Rows strictly after ``values`` in ``ordering`` (before, if not ``forward``)."""
+    condition = Q()
+    equal = Q()
+    for name, value in zip(ordering, values):
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        lookup = 'lt' if descending == forward else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _reverse(name):
+    return name[1:] if name.startswith('-') else f'-{name}'
+
+
+class CursorPage:
+    """A page of a keyset-paginated queryset, in the queryset's own order."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginate_by_cursor(queryset, cursor, page_size):
+    """
+    Return a ``CursorPage`` of ``queryset`` after/before ``cursor``.
+
+    Seeks on ``keyset(queryset)`` instead of using OFFSET and never counts
+    the queryset, so every page costs the same regardless of its depth.
+    Ranked querysets (search relevance, ingredient matches) keep their rank
+    order because the rank is part of the key.
+    """
+    ordering = keyset(queryset)
+    direction = NEXT
+    if cursor:
+        try:
+            values, direction = decode_cursor(cursor, queryset.model, ordering)
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+        queryset = queryset.filter(_seek(ordering, values, forward=direction == NEXT))
+
+    if direction == PREVIOUS:
+        queryset = queryset.order_by(*[_reverse(name) for name in ordering])
+    else:
+        queryset = queryset.order_by(*ordering)
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == PREVIOUS:
+        rows.reverse()
+
+    if not rows:
+        return CursorPage(rows, None, None)
+
+    if direction == PREVIOUS:
+        next_cursor = encode_cursor(rows[-1], ordering, NEXT)
+        previous_cursor = encode_cursor(rows[0], ordering, PREVIOUS) if has_more else None
+    else:
+        next_cursor = encode_cursor(rows[-1], ordering, NEXT) if has_more else None
+        previous_cursor = encode_cursor(rows[0], ordering, PREVIOUS) if cursor else None
+    return CursorPage(rows, next_cursor, previous_cursor)
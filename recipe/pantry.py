@@ -0,0 +1,126 @@
+"""
+Inverted ingredient index for "what can I cook with ..." searches.
+
+Ingredient names are canonicalised (case folded, punctuation dropped,
+plurals singularised) and every run of up to ``MAX_TERM_WORDS`` words is
+stored as an ``IngredientTerm`` row, so "olive oil" matches "Extra Virgin
+Olive Oil" and "tomato" matches "Cherry Tomatoes" with an indexed lookup.
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+
+MAX_TERM_WORDS = 3
+MAX_TERM_LENGTH = 100
+
+_WORD_RE = re.compile(r'[^\W\d_]+', re.UNICODE)
+# Words that end in "s" without being plurals.
+_NOT_PLURAL = ('ss', 'us', 'is', 'ous')
+_ES_PLURAL = ('ches', 'shes', 'sses', 'xes', 'zes', 'oes')
+
+
+def singular(word):
+    if len(word) <= 3 or word.endswith(_NOT_PLURAL):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(_ES_PLURAL):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def canonical_name(name):
+    """``"  Fresh Tomatoes!"`` -> ``"fresh tomato"``."""
+    return ' '.join(singular(word) for word in _WORD_RE.findall((name or '').casefold()))
+
+
+def terms_for(name):
+    """Every contiguous run of up to ``MAX_TERM_WORDS`` words of the canonical name."""
+    words = canonical_name(name).split()
+    terms = set()
+    for start in range(len(words)):
+        for end in range(start + 1, min(start + MAX_TERM_WORDS, len(words)) + 1):
+            terms.add(' '.join(words[start:end])[:MAX_TERM_LENGTH])
+    return terms
+
+
+def query_terms(text):
+    """Canonical terms for a comma separated list such as ``"tomatoes, Basil"``."""
+    terms = []
+    for part in (text or '').split(','):
+        term = canonical_name(part)[:MAX_TERM_LENGTH]
+        if term and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def index_recipes(recipes):
+    """Rebuild the ingredient terms of ``recipes`` with one delete and one insert."""
+    reindex_recipes([recipe.pk for recipe in recipes])
+
+
+@transaction.atomic
+def reindex_recipes(recipe_ids):
+    """``index_recipes`` by id; ids of deleted recipes simply end up with no terms."""
+    from .models import Ingredient, IngredientTerm
+
+    recipe_ids = list(recipe_ids)
+    IngredientTerm.objects.filter(recipe_id__in=recipe_ids).delete()
+    terms = set()
+    for recipe_id, name in (
+        Ingredient.objects.filter(recipe_id__in=recipe_ids).values_list('recipe_id', 'name')
+    ):
+        terms.update((recipe_id, term) for term in terms_for(name))
+    IngredientTerm.objects.bulk_create(
+        [IngredientTerm(recipe_id=recipe_id, term=term) for recipe_id, term in sorted(terms)],
+        batch_size=1000,
+    )
+
+
+def index_recipe(recipe):
+    index_recipes([recipe])
+
+
+def rebuild_index(batch_size=500):
+    """Reindex every recipe in batches; returns the number of recipes."""
+    from .models import Recipe
+
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(Recipe.objects.filter(pk__gt=last_pk).order_by('pk').only('id')[:batch_size])
+        if not batch:
+            break
+        index_recipes(batch)
+        total += len(batch)
+        last_pk = batch[-1].pk
+    return total
+
+
+def rank_by_ingredients(queryset, text):
+    """
+    Keep recipes using at least one of the comma separated ingredients in
+    ``text``, annotated with ``ingredient_matches`` (how many of them the
+    recipe uses) and ordered by it.
+    """
+    from .models import IngredientTerm
+
+    terms = query_terms(text)
+    if not terms:
+        return queryset
+    hits = IngredientTerm.objects.filter(term__in=terms)
+    matches = (
+        hits.filter(recipe=OuterRef('pk'))
+        .order_by()
+        .values('recipe')
+        .annotate(matches=Count('*'))
+        .values('matches')
+    )
+    return (
+        queryset.filter(pk__in=hits.values('recipe'))
+        .annotate(ingredient_matches=Subquery(matches))
+        .order_by('-ingredient_matches', '-created')
+    )
@@ -0,0 +1,362 @@
+"""
+Offline recipe neighbours: "similar recipes" built from ingredients, cuisine
+and category, and "liked by the same people" built from ``RecipeLike``.
+
+Each recipe becomes a sparse TF-IDF vector over its canonical ingredient
+terms (see ``recipe.pantry``) plus ``cuisine:`` and ``category:`` features.
+Cosine neighbours are found through an inverted index, so only recipes that
+share a feature are ever compared, and the top ``SIMILAR_TOP_K`` of each
+recipe are stored as ``RelatedRecipe`` rows. Pages then read them with one
+indexed query instead of scoring anything per request.
+
+Co-liked neighbours are item-item cosine similarities of like vectors,
+``co_likes(a, b) / sqrt(likes(a) * likes(b))``, counted from the like
+baskets of the users who liked each recipe.
+
+Runs are incremental: only recipes whose ``modified`` moved (or, for
+co-likes, that gained likes or whose likers liked something) since the last
+run are rescored, plus similar lists left short by deleted recipes. Co-like
+lists shortened by unlikes or deletions need a periodic full run.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+SIMILAR_TOP_K = 8
+# Features shared by more than this share of recipes ("salt", a cuisine
+# most recipes use) barely separate neighbours but dominate the cost.
+MAX_DF_RATIO = 0.3
+# Longer posting lists keep only their heaviest entries; candidates found
+# through them are rescored exactly, ``RESCORE_FACTOR`` per neighbour kept.
+MAX_POSTINGS = 500
+RESCORE_FACTOR = 4
+DEFAULT_BATCH_SIZE = 500
+
+CO_LIKED_TOP_K = 10
+# Users who like nearly everything say little about any pair of recipes and
+# make a quadratic number of pairs, so their baskets are not counted.
+MAX_BASKET_SIZE = 1000
+# How many of a user's latest likes seed their recommendations.
+RECOMMENDATION_SEEDS = 20
+
+
+def _features():
+    """``{recipe_id: set of feature strings}`` for every recipe."""
+    from .models import IngredientTerm, Recipe
+
+    documents = {}
+    for pk, cuisine, category in Recipe.objects.values_list('pk', 'cuisine', 'category').iterator(chunk_size=2000):
+        features = documents[pk] = {f'category:{category}'}
+        cuisine = ' '.join((cuisine or '').casefold().split())
+        if cuisine:
+            features.add(f'cuisine:{cuisine}')
+    for recipe_id, term in IngredientTerm.objects.values_list('recipe_id', 'term').iterator(chunk_size=5000):
+        features = documents.get(recipe_id)
+        if features is not None:
+            features.add(term)
+    return documents
+
+
+class SimilarityIndex:
+    """
+    L2-normalised TF-IDF vectors of ``documents`` (``{pk: features}``) and
+    an inverted index from feature to ``(pk, weight)`` postings.
+
+    Features seen in a single recipe cannot link two recipes and features in
+    more than ``max_df_ratio`` of them are kept in the vectors but left out
+    of the postings. Lists over ``MAX_POSTINGS`` are cut to their heaviest
+    entries, so a lookup touches a bounded number of candidates; the best
+    of those are then scored on the full vectors.
+    """
+
+    def __init__(self, documents, max_df_ratio=None):
+        total = len(documents)
+        df = Counter(feature for features in documents.values() for feature in features)
+        idf = {feature: math.log((total + 1) / (count + 1)) + 1 for feature, count in df.items()}
+        max_df = max(2, (MAX_DF_RATIO if max_df_ratio is None else max_df_ratio) * total)
+
+        self.vectors = {}
+        self.postings = defaultdict(list)
+        for pk, features in documents.items():
+            norm = math.sqrt(sum(idf[feature] ** 2 for feature in features)) or 1.0
+            vector = {feature: idf[feature] / norm for feature in features}
+            self.vectors[pk] = vector
+            for feature, weight in vector.items():
+                if 1 < df[feature] <= max_df:
+                    self.postings[feature].append((pk, weight))
+        for feature, postings in self.postings.items():
+            if len(postings) > MAX_POSTINGS:
+                self.postings[feature] = heapq.nsmallest(MAX_POSTINGS, postings, key=lambda p: (-p[1], p[0]))
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def similarity(self, a, b):
+        vector, other = self.vectors[a], self.vectors[b]
+        if len(other) < len(vector):
+            vector, other = other, vector
+        return sum(weight * other.get(feature, 0.0) for feature, weight in vector.items())
+
+    def neighbours(self, pk, limit=SIMILAR_TOP_K):
+        """``[(other_pk, cosine), ...]`` best first, ties broken by lower pk."""
+        scores = defaultdict(float)
+        for feature, weight in self.vectors.get(pk, {}).items():
+            for other, other_weight in self.postings.get(feature, ()):
+                scores[other] += weight * other_weight
+        scores.pop(pk, None)
+        candidates = heapq.nlargest(limit * RESCORE_FACTOR, scores, key=scores.get)
+        exact = [(other, self.similarity(pk, other)) for other in candidates]
+        return heapq.nsmallest(limit, exact, key=lambda item: (-item[1], item[0]))
+
+
+def build_index():
+    return SimilarityIndex(_features())
+
+
+def _chunks(items, size):
+    items = sorted(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _short_lists(index, top_k):
+    """
+    Recipes storing fewer than ``top_k`` neighbours while the index now
+    finds more, typically because a neighbour was deleted and its rows went
+    with it by cascade.
+    """
+    from .models import RelatedRecipe
+
+    stored = dict(
+        RelatedRecipe.objects.filter(kind=RelatedRecipe.Kinds.SIMILAR)
+        .order_by().values('recipe').annotate(rows=Count('pk')).values_list('recipe', 'rows')
+    )
+    return {
+        pk for pk in index.vectors
+        if stored.get(pk, 0) < top_k and len(index.neighbours(pk, top_k)) > stored.get(pk, 0)
+    }
+
+
+def _affected_recipes(index, since, batch_size, top_k=SIMILAR_TOP_K):
+    """
+    Recipes whose neighbour lists may have changed since ``since``: the
+    changed recipes, every recipe that currently lists one of them, the new
+    neighbours of the changed recipes (similarity is symmetric, so a changed
+    recipe usually belongs in its neighbours' lists too) and the lists left
+    short by deleted recipes.
+    """
+    from .models import Recipe, RelatedRecipe
+
+    changed = set(Recipe.objects.filter(modified__gte=since).values_list('pk', flat=True))
+    affected = set(changed) | _short_lists(index, top_k)
+    for chunk in _chunks(changed, batch_size):
+        affected.update(
+            RelatedRecipe.objects.filter(kind=RelatedRecipe.Kinds.SIMILAR, related_id__in=chunk)
+            .values_list('recipe_id', flat=True)
+        )
+    for pk in changed:
+        affected.update(other for other, _ in index.neighbours(pk))
+    return affected
+
+
+def _write_neighbours(index, recipe_ids, kind, top_k):
+    from .models import RelatedRecipe
+
+    rows = [
+        RelatedRecipe(recipe_id=pk, related_id=other, kind=kind, score=score)
+        for pk in recipe_ids
+        for other, score in index.neighbours(pk, top_k)
+    ]
+    with transaction.atomic():
+        RelatedRecipe.objects.filter(kind=kind, recipe_id__in=recipe_ids).delete()
+        RelatedRecipe.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def last_run(kind):
+    from .models import RecommenderRun
+
+    return RecommenderRun.objects.filter(kind=kind).first()
+
+
+def _record_run(kind, started):
+    from .models import RecommenderRun
+
+    RecommenderRun.objects.update_or_create(kind=kind, defaults={'started': started, 'finished': timezone.now()})
+
+
+def refresh_similar(full=False, top_k=SIMILAR_TOP_K, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Recompute stored similar recipes; everything on the first run or with
+    ``full``, otherwise only what changed since the last run started.
+    Returns ``(recipes rescored, rows written)``.
+    """
+    from .models import RelatedRecipe
+
+    kind = RelatedRecipe.Kinds.SIMILAR
+    started = timezone.now()
+    previous = last_run(kind)
+    index = build_index()
+
+    if full or previous is None:
+        affected = set(index.vectors)
+    else:
+        affected = _affected_recipes(index, previous.started, batch_size, top_k) & set(index.vectors)
+
+    written = 0
+    for chunk in _chunks(affected, batch_size):
+        written += _write_neighbours(index, chunk, kind, top_k)
+    _record_run(kind, started)
+    return len(affected), written
+
+
+class CoLikeIndex:
+    """
+    Item-item co-like cosines over ``baskets`` (``{user_id: [recipe_id]}``).
+
+    ``like_counts`` holds every recipe's total likes, so ``baskets`` only
+    needs the users who liked the recipes being scored.
+    """
+
+    def __init__(self, baskets, like_counts):
+        self.baskets = baskets
+        self.like_counts = like_counts
+        self.likers = defaultdict(list)
+        for user_id, recipe_ids in baskets.items():
+            if len(recipe_ids) <= MAX_BASKET_SIZE:
+                for recipe_id in recipe_ids:
+                    self.likers[recipe_id].append(user_id)
+
+    def neighbours(self, pk, limit=CO_LIKED_TOP_K):
+        co_likes = Counter()
+        for user_id in self.likers.get(pk, ()):
+            co_likes.update(self.baskets[user_id])
+        co_likes.pop(pk, None)
+        likes = self.like_counts.get(pk, 0)
+        # Counts are read before the baskets, so a like landing in between
+        # must not push a score above 1.
+        scores = (
+            (other, count / math.sqrt(max(likes, count) * max(self.like_counts.get(other, 0), count)))
+            for other, count in co_likes.items()
+        )
+        return heapq.nsmallest(limit, scores, key=lambda item: (-item[1], item[0]))
+
+
+def _like_counts():
+    from .models import RecipeLike
+
+    return dict(
+        RecipeLike.objects.order_by().values('recipe').annotate(likes=Count('pk')).values_list('recipe', 'likes')
+    )
+
+
+def _like_baskets(recipe_ids=None):
+    """Every like of the users who liked any of ``recipe_ids`` (all likes if None), by user."""
+    from .models import RecipeLike
+
+    likes = RecipeLike.objects.order_by()
+    if recipe_ids is not None:
+        likes = likes.filter(user__in=RecipeLike.objects.filter(recipe__in=recipe_ids).values('user'))
+    baskets = defaultdict(list)
+    for user_id, recipe_id in likes.values_list('user_id', 'recipe_id').iterator(chunk_size=5000):
+        baskets[user_id].append(recipe_id)
+    return baskets
+
+
+def _co_liked_affected(since):
+    """
+    Recipes liked since ``since``, everything their new likers liked and
+    every recipe listing a newly liked one (its like count, the score's
+    denominator, moved): the only co-like scores new likes can change.
+    Unlikes and deleted recipes leave no row behind, so lists they shortened
+    are only refilled by the next full run.
+    """
+    from .models import RecipeLike, RelatedRecipe
+
+    new_likes = RecipeLike.objects.filter(created__gte=since)
+    affected = set(new_likes.values_list('recipe_id', flat=True))
+    affected.update(
+        RecipeLike.objects.filter(user__in=new_likes.values('user')).values_list('recipe_id', flat=True)
+    )
+    affected.update(
+        RelatedRecipe.objects.filter(kind=RelatedRecipe.Kinds.CO_LIKED, related__in=new_likes.values('recipe'))
+        .values_list('recipe_id', flat=True)
+    )
+    return affected
+
+
+def refresh_co_liked(full=False, top_k=CO_LIKED_TOP_K, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Recompute stored co-liked recipes, in batches that each load only the
+    baskets of their recipes' likers. Returns ``(recipes rescored, rows written)``.
+    """
+    from .models import RelatedRecipe
+
+    kind = RelatedRecipe.Kinds.CO_LIKED
+    started = timezone.now()
+    previous = last_run(kind)
+    like_counts = _like_counts()
+
+    if full or previous is None:
+        # One pass over the likes serves every batch; recipes that lost all
+        # their likes are included so their old rows are cleared.
+        affected = set(like_counts)
+        affected.update(RelatedRecipe.objects.filter(kind=kind).values_list('recipe_id', flat=True).distinct())
+        index = CoLikeIndex(_like_baskets(), like_counts)
+    else:
+        affected = _co_liked_affected(previous.started)
+        index = None
+
+    written = 0
+    for chunk in _chunks(affected, batch_size):
+        chunk_index = index or CoLikeIndex(_like_baskets(chunk), like_counts)
+        written += _write_neighbours(chunk_index, chunk, kind, top_k)
+    _record_run(kind, started)
+    return len(affected), written
+
+
+def related_recipes(recipe, kind, limit=SIMILAR_TOP_K):
+    """Stored neighbours of ``recipe`` best first, shaped for cards; one query."""
+    from .models import Recipe, RelatedRecipe
+
+    rows = RelatedRecipe.objects.filter(recipe=recipe, kind=kind)
+    score = rows.filter(related=OuterRef('pk')).values('score')
+    return list(
+        Recipe.objects.for_cards()
+        .filter(pk__in=rows.values('related'))
+        .annotate(related_score=Subquery(score))
+        .order_by('-related_score', 'pk')[:limit]
+    )
+
+
+def similar_recipes(recipe, limit=SIMILAR_TOP_K):
+    from .models import RelatedRecipe
+
+    return related_recipes(recipe, RelatedRecipe.Kinds.SIMILAR, limit)
+
+
+def recommended_for(user, limit=CO_LIKED_TOP_K):
+    """
+    Recipes liked by people who liked what ``user`` liked lately, scored by
+    summed co-like similarity and excluding recipes ``user`` already likes.
+    """
+    from .models import Recipe, RecipeLike, RelatedRecipe
+
+    liked = RecipeLike.objects.filter(user=user)
+    seeds = liked.order_by('-created').values('recipe')[:RECOMMENDATION_SEEDS]
+    ranked = list(
+        RelatedRecipe.objects.filter(kind=RelatedRecipe.Kinds.CO_LIKED, recipe__in=seeds)
+        .exclude(related__in=liked.values('recipe'))
+        .values('related')
+        .annotate(total=Sum('score'))
+        .order_by('-total', 'related')
+        .values_list('related', flat=True)[:limit]
+    )
+    if not ranked:
+        return []
+    by_id = Recipe.objects.for_cards().in_bulk(ranked)
+    return [by_id[pk] for pk in ranked if pk in by_id]
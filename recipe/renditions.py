@@ -0,0 +1,146 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Rendition name -> maximum width in pixels. Originals are never upscaled.
+RENDITION_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'hero': 1280,
+}
+
+# Threads per process that render uploads after the response has been sent.
+BACKGROUND_WORKERS = 2
+
+# File extension -> (Pillow format, save options)
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def rendition_name(source_name, size, extension):
+    """``recipes/7/pasta.png`` -> ``recipes/7/pasta_card.webp``, next to the original."""
+    stem, _ = os.path.splitext(source_name)
+    return f"{stem}_{size}.{extension}"
+
+
+def is_renderable(source_name):
+    """Shared placeholders such as ``default-recipe.jpg`` live at the media root and are skipped."""
+    return bool(source_name) and bool(os.path.dirname(source_name))
+
+
+def _resized(image, width):
+    if image.width <= width:
+        return image.copy()
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def _flatten(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_renditions(source_name, storage=default_storage):
+    """
+    Generate every size/format rendition of ``source_name`` in ``storage``.
+
+    Returns the mapping stored on the model, e.g.
+    ``{'card': {'width': 480, 'webp': 'recipes/7/pasta_card.webp', ...}}``,
+    or an empty dict when the source is missing or not a readable image.
+    Touches only the storage, never the database, so it is safe to run in
+    worker processes.
+    """
+    if not is_renderable(source_name):
+        return {}
+    try:
+        with storage.open(source_name, 'rb') as source:
+            image = Image.open(source)
+            image.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return {}
+
+    image = _flatten(ImageOps.exif_transpose(image))
+    renditions = {}
+    for size, width in RENDITION_SIZES.items():
+        resized = _resized(image, width)
+        entry = {'width': resized.width}
+        for extension, (image_format, options) in RENDITION_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, **options)
+            name = rendition_name(source_name, size, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            entry[extension] = storage.save(name, ContentFile(buffer.getvalue()))
+        renditions[size] = entry
+    return renditions
+
+
+def _file_names(renditions):
+    return {
+        entry[extension]
+        for entry in renditions.values()
+        for extension in RENDITION_FORMATS
+        if entry.get(extension)
+    }
+
+
+def delete_renditions(renditions, storage=default_storage, keep=()):
+    for name in _file_names(renditions) - set(keep):
+        if storage.exists(name):
+            storage.delete(name)
+
+
+def refresh_renditions(instance):
+    """Regenerate and persist the renditions of a ``RenditionMixin`` model instance."""
+    source = getattr(instance, instance.rendition_source_field)
+    stale = instance.renditions or {}
+    instance.renditions = render_renditions(source.name, source.storage) if source else {}
+    delete_renditions(stale, source.storage, keep=_file_names(instance.renditions))
+    type(instance).objects.filter(pk=instance.pk).update(renditions=instance.renditions)
+    return instance.renditions
+
+
+_executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix='renditions')
+
+
+def refresh_by_pk(model, pk):
+    """``refresh_renditions`` for a row that may have been deleted since."""
+    instance = model.objects.filter(pk=pk).first()
+    if instance is not None:
+        refresh_renditions(instance)
+
+
+def _run_in_background(model, pk):
+    try:
+        refresh_by_pk(model, pk)
+    except Exception:
+        logger.exception("Rendering %s %s failed; generate_renditions will retry it.", model.__name__, pk)
+    finally:
+        # Pool threads outlive the request cycle that would close their connection.
+        close_old_connections()
+
+
+def refresh_in_background(instance):
+    """
+    Render ``instance`` on a worker thread once the transaction commits.
+
+    Pages fall back to the original until the renditions are stored; rows
+    lost to a restart keep ``renditions={}`` and are picked up by
+    ``manage.py generate_renditions``.
+    """
+    transaction.on_commit(partial(_executor.submit, _run_in_background, type(instance), instance.pk))
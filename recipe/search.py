@@ -0,0 +1,174 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'recipe_search'
+SEARCH_COLUMNS = ('title', 'cuisine', 'instructions', 'ingredients')
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+_available_on = set()
+
+
+def is_available():
+    """Return True when the FTS5 search table exists on the current database."""
+    if connection.vendor != 'sqlite':
+        return False
+    name = str(connection.settings_dict['NAME'])
+    if name not in _available_on:
+        if SEARCH_TABLE not in connection.introspection.table_names():
+            return False
+        _available_on.add(name)
+    return True
+
+
+def build_match_query(text, column=None):
+    """
+    Turn free user input into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so punctuation and FTS
+    operators typed by the user can never produce a syntax error.
+    """
+    terms = [f'"{token}"*' for token in _TOKEN_RE.findall(text or '')]
+    if not terms:
+        return ''
+    expression = ' '.join(terms)
+    if column:
+        return f'{{{column}}} : ({expression})'
+    return expression
+
+
+def _document(recipe, ingredient_names):
+    return (
+        recipe.pk,
+        recipe.title,
+        recipe.cuisine,
+        recipe.instructions,
+        ' '.join(ingredient_names),
+    )
+
+
+def index_recipe(recipe):
+    """Insert or refresh the search row of a single recipe."""
+    if not is_available():
+        return
+    names = recipe.ingredients.values_list('name', flat=True)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [recipe.pk])
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(SEARCH_COLUMNS)}) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            _document(recipe, names),
+        )
+
+
+def remove_recipe(recipe_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [recipe_id])
+
+
+def _insert_documents(recipes, Ingredient):
+    names = {}
+    for recipe_id, name in (
+        Ingredient.objects.filter(recipe__in=recipes).values_list('recipe_id', 'name')
+    ):
+        names.setdefault(recipe_id, []).append(name)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(SEARCH_COLUMNS)}) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            [_document(recipe, names.get(recipe.pk, [])) for recipe in recipes],
+        )
+
+
+def index_recipes(recipes):
+    """Insert or refresh the search rows of many recipes in a handful of statements."""
+    if not is_available() or not recipes:
+        return
+    from .models import Ingredient
+
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+            [(recipe.pk,) for recipe in recipes],
+        )
+    _insert_documents(recipes, Ingredient)
+
+
+def reindex_recipes(recipe_ids):
+    """Refresh the rows of ``recipe_ids`` in a fixed number of statements, dropping deleted recipes."""
+    if not is_available() or not recipe_ids:
+        return
+    from .models import Ingredient, Recipe
+
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+            [(pk,) for pk in recipe_ids],
+        )
+    recipes = list(Recipe.objects.filter(pk__in=recipe_ids).only('id', 'title', 'cuisine', 'instructions'))
+    if recipes:
+        _insert_documents(recipes, Ingredient)
+
+
+def rebuild_index(batch_size=1000):
+    """Repopulate the whole search table from Recipe and Ingredient rows."""
+    from .models import Ingredient, Recipe
+
+    if not is_available():
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+    total = 0
+    recipes = Recipe.objects.only('id', 'title', 'cuisine', 'instructions').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(recipes.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        _insert_documents(batch, Ingredient)
+        total += len(batch)
+        last_pk = batch[-1].pk
+    return total
+
+
+def filter_queryset(queryset, text, column=None, fallback_fields=('title',)):
+    """
+    Restrict ``queryset`` to recipes matching ``text``.
+
+    Uses the FTS5 index when present and falls back to ``icontains`` on
+    ``fallback_fields`` for other backends.
+    """
+    match = build_match_query(text, column)
+    if not match:
+        return queryset
+    if not is_available():
+        condition = Q()
+        for field in fallback_fields:
+            condition |= Q(**{f'{field}__icontains': text})
+        return queryset.filter(condition)
+    return queryset.filter(
+        pk__in=RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", (match,))
+    )
+
+
+def rank_queryset(queryset, text):
+    """Filter by ``text`` and order the matches by BM25 relevance."""
+    queryset = filter_queryset(queryset, text)
+    match = build_match_query(text)
+    if not match or not is_available():
+        return queryset
+    table = queryset.model._meta.db_table
+    rank = RawSQL(
+        f"SELECT bm25({SEARCH_TABLE}) FROM {SEARCH_TABLE} "
+        f"WHERE {SEARCH_TABLE} MATCH %s AND rowid = \"{table}\".\"id\"",
+        (match,),
+    )
+    return queryset.annotate(search_rank=rank).order_by('search_rank', '-created')
@@ -1,10 +1,135 @@
-from django.db.models.signals import post_save
+import logging
+import threading
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save
 from django.conf import settings
 from django.dispatch import receiver
-from .models import Profile
+from . import autocomplete, caching, pantry, search, trending
+from .models import Ingredient, Profile, Recipe, RecipeImage, RecipeLike
+
+logger = logging.getLogger(__name__)
 
 @receiver(post_save,sender=settings.AUTH_USER_MODEL)
 def create_profile(sender,instance,created,**kwargs):
     if created:
         Profile.objects.create(user=instance)
 
+
+def _shows_recipe(key, recipe_id):
+    fragment = caching.peek(key)
+    return fragment is not None and recipe_id in fragment['ids']
+
+
+def _invalidate_homepage(recipe_id, ranking_changed=False, created=False):
+    """Drop only the homepage fragments that display (or may now display) ``recipe_id``."""
+    # After commit, so a concurrent rebuild cannot re-cache the old rows.
+    transaction.on_commit(partial(_drop_homepage, recipe_id, ranking_changed, created))
+
+
+def _drop_homepage(recipe_id, ranking_changed, created):
+    if created or _shows_recipe(caching.HOMEPAGE_LATEST_KEY, recipe_id):
+        caching.invalidate(caching.HOMEPAGE_LATEST_KEY)
+    if ranking_changed or created or _shows_recipe(caching.HOMEPAGE_POPULAR_KEY, recipe_id):
+        caching.invalidate(caching.HOMEPAGE_POPULAR_KEY)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_homepage_for_recipe(sender, instance, created=False, **kwargs):
+    _invalidate_homepage(instance.pk, created=created)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_facets(sender, **kwargs):
+    caching.invalidate_on_commit(caching.RECIPE_FACETS_KEY)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe_for_search(sender, instance, **kwargs):
+    search.index_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_search(sender, instance, **kwargs):
+    search.remove_recipe(instance.pk)
+
+
+_pending = threading.local()
+
+
+def _reindex_pending():
+    recipe_ids = getattr(_pending, 'recipe_ids', set())
+    _pending.recipe_ids = set()
+    if recipe_ids:
+        search.reindex_recipes(recipe_ids)
+        pantry.reindex_recipes(recipe_ids)
+
+
+def _reindex_on_commit(recipe_id):
+    """
+    Refresh the search row and ingredient terms of ``recipe_id`` once when
+    the transaction commits, however many of its ingredients changed. Ids left over from a rolled back transaction
+    are simply reindexed along with the next batch.
+    """
+    if not hasattr(_pending, 'recipe_ids'):
+        _pending.recipe_ids = set()
+    _pending.recipe_ids.add(recipe_id)
+    transaction.on_commit(_reindex_pending)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def reindex_recipe_for_ingredient(sender, instance, **kwargs):
+    _reindex_on_commit(instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_autocomplete(sender, **kwargs):
+    # After commit, so a rebuild sees the ingredients saved with the recipe.
+    transaction.on_commit(autocomplete.invalidate)
+
+
+@receiver(post_save, sender=RecipeImage)
+@receiver(post_delete, sender=RecipeImage)
+def refresh_recipe_covers(sender, instance, created=True, **kwargs):
+    # Re-saves (e.g. new renditions) cannot change which images are oldest.
+    if created:
+        Recipe(pk=instance.recipe_id).refresh_cover_images()
+
+
+@receiver(post_save, sender=RecipeImage)
+@receiver(post_delete, sender=RecipeImage)
+def invalidate_homepage_for_image(sender, instance, **kwargs):
+    _invalidate_homepage(instance.recipe_id)
+
+
+@receiver(post_delete, sender=RecipeLike)
+def uncount_deleted_like(sender, instance, origin=None, **kwargs):
+    """
+    Take a removed like off ``Recipe.likes`` and its trending score, whether
+    it was unliked, deleted in the admin or cascaded from its user.
+    """
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is Recipe:
+        # The recipe, its counter and its trend row are going away too.
+        return
+    recipe = Recipe.objects.filter(pk=instance.recipe_id)
+    if not recipe.filter(likes__gt=0).update(likes=F('likes') - 1):
+        # The counter is already behind the RecipeLike rows; it cannot go negative.
+        logger.error(
+            "Recipe %s had no likes to remove; run reconcile_like_counts.", instance.recipe_id,
+        )
+    trending.record_unlike(instance.recipe_id, instance.created)
+
+
+@receiver(post_save, sender=RecipeLike)
+@receiver(post_delete, sender=RecipeLike)
+def invalidate_homepage_for_like(sender, instance, **kwargs):
+    _invalidate_homepage(instance.recipe_id, ranking_changed=True)
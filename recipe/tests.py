@@ -1,12 +1,43 @@
-from django.test import TestCase, Client
+import json
+import tempfile
+from datetime import timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
+
+from PIL import Image
+
+from django.apps import apps as django_apps
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
 
-from .domains import create_recipe_with_details, update_recipe_with_details
-from .models import Collection, Recipe, Ingredient, Nutrition, RecipeImage
-from .mixins import RecipeTestDataMixin
+from . import autocomplete
+from . import caching
+from . import importing
+from . import likes
+from . import pantry
+from . import recommendations
+from . import renditions
+from . import search as search_index
+from . import trending
+from . import views
+from .domains import create_recipe_with_details, delete_recipe, toggle_like, update_recipe_with_details
+from .filters import RecipeFilter
+from .forms import RecipeImageForm
+from .instructions import parse_instructions
+from .models import Collection, Recipe, Ingredient, IngredientTerm, Nutrition, RecipeImage, RecipeLike, RecipeTrend, RelatedRecipe, SearchQuery, ordered_images_prefetch
+from .mixins import RecipeTestDataMixin, TemporaryMediaMixin
+from .pagination import paginate_by_cursor
+from .renditions import RENDITION_SIZES, refresh_renditions
 
-class CreateRecipeDomainFunctionTestCase(RecipeTestDataMixin, TestCase):
+class CreateRecipeDomainFunctionTestCase(TemporaryMediaMixin, RecipeTestDataMixin, TestCase):
 
     def setUp(self):
         self.user = self.create_test_user(username="domainuser")
@@ -72,7 +103,59 @@ class CreateRecipeDomainFunctionTestCase(RecipeTestDataMixin, TestCase):
         recipe = Recipe.objects.get(title='Domain Recipe')
         self.assertEqual(recipe.ingredients.count(), 2)
 
-class RecipeDetailViewTestCase(RecipeTestDataMixin, TestCase):
+    def test_domain_statement_count_independent_of_ingredient_count(self):
+        def statements(count):
+            ingredients_data = [
+                {'name': f'Ingredient {i}', 'quantity': i, 'unit': '0', 'optional': False}
+                for i in range(count)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                create_recipe_with_details(
+                    user=self.user,
+                    recipe_data=dict(self.recipe_data, title=f'Recipe with {count}'),
+                    nutrition_data=self.nutrition_data,
+                    image_data={},
+                    ingredients_data=ingredients_data,
+                )
+            return len(queries)
+
+        self.assertEqual(statements(2), statements(40))
+        recipe = Recipe.objects.get(title='Recipe with 40')
+        self.assertEqual(recipe.ingredients.count(), 40)
+
+    def test_domain_creates_multiple_images(self):
+        images = [
+            SimpleUploadedFile(f'domain_{i}.jpg', b'GIF87a', content_type='image/jpeg')
+            for i in range(3)
+        ]
+        create_recipe_with_details(
+            user=self.user,
+            recipe_data=self.recipe_data,
+            nutrition_data=self.nutrition_data,
+            image_data={'image': images},
+            ingredients_data=[],
+        )
+        recipe = Recipe.objects.get(title='Domain Recipe')
+        first, second, _ = recipe.images.order_by('created', 'id')
+        self.assertEqual(recipe.cover_image, first)
+        self.assertEqual(recipe.second_image, second)
+
+    def test_image_form_accepts_multiple_files(self):
+        uploads = MultiValueDict({'image': [self.image_upload(f'form_{i}.png') for i in range(2)]})
+        form = RecipeImageForm(data={}, files=uploads)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(len(form.cleaned_data['image']), 2)
+
+        empty = RecipeImageForm(data={}, files={})
+        self.assertTrue(empty.is_valid())
+        self.assertEqual(empty.cleaned_data['image'], [])
+
+    def image_upload(self, name):
+        buffer = BytesIO()
+        Image.new('RGB', (4, 4)).save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+class RecipeDetailViewTestCase(TemporaryMediaMixin, RecipeTestDataMixin, TestCase):
 
     def setUp(self):
         self.client = Client()
@@ -332,3 +415,1587 @@ class RecipeListViewTest(TestCase, RecipeTestDataMixin):
         response = self.client.get(reverse("recipe:list"))
         self.assertTrue(response.context["is_paginated"])
         self.assertEqual(len(response.context["recipes"]), 12)
+
+
+class RecipeSearchIndexTestCase(RecipeTestDataMixin, TestCase):
+
+    def setUp(self):
+        self.user = self.create_test_user(username='searchuser')
+        self.nutrition_data = {
+            'calories': 250, 'protein': 15, 'fat': 10,
+            'sugar': 5, 'fiber': 3, 'carbohydrates': 30,
+        }
+
+    def create_recipe(self, title, cuisine='Italian', instructions='Cook well.', ingredients=()):
+        create_recipe_with_details(
+            user=self.user,
+            recipe_data={
+                'title': title, 'category': '0', 'cuisine': cuisine, 'difficulty': '0',
+                'servings': 2, 'prep_time': 10, 'total_time': 20, 'instructions': instructions,
+            },
+            nutrition_data=self.nutrition_data,
+            image_data={},
+            ingredients_data=[
+                {'name': name, 'quantity': 1, 'unit': '0', 'optional': False}
+                for name in ingredients
+            ],
+        )
+        return Recipe.objects.get(title=title)
+
+    def search(self, **params):
+        return list(RecipeFilter(params, queryset=Recipe.objects.all()).qs)
+
+    def test_search_matches_ingredient_names(self):
+        risotto = self.create_recipe('Risotto', ingredients=['Arborio rice', 'Saffron'])
+        self.create_recipe('Pancakes', ingredients=['Flour'])
+        self.assertEqual(self.search(search='saffron'), [risotto])
+
+    def test_search_ranks_title_matches_first(self):
+        mention = self.create_recipe('Stew', instructions='Add one tomato. Simmer for an hour.')
+        title = self.create_recipe('Tomato Tomato Soup', ingredients=['Tomato'])
+        self.assertEqual(self.search(search='tomato'), [title, mention])
+
+    def test_cursor_pages_keep_rank_order(self):
+        title = self.create_recipe('Tomato Tomato Soup', ingredients=['Tomato', 'Basil'])
+        mention = self.create_recipe('Stew', instructions='Add one tomato.', ingredients=['Basil'])
+        for queryset in (
+            search_index.rank_queryset(Recipe.objects.all(), 'tomato'),
+            pantry.rank_by_ingredients(Recipe.objects.all(), 'tomatoes, basil'),
+        ):
+            first = paginate_by_cursor(queryset, None, 1)
+            second = paginate_by_cursor(queryset, first.next_cursor, 1)
+            back = paginate_by_cursor(queryset, second.previous_cursor, 1)
+            self.assertEqual([list(first), list(second), list(back)], [[title], [mention], [title]])
+            self.assertFalse(second.has_next())
+
+    def test_search_handles_fts_syntax_in_input(self):
+        recipe = self.create_recipe('Fish Curry')
+        self.assertEqual(self.search(search='fish" (curry*'), [recipe])
+
+    def test_index_follows_update_and_delete(self):
+        recipe = self.create_recipe('Lasagne')
+        update_recipe_with_details(
+            recipe=recipe, user=self.user, recipe_data={'title': 'Moussaka'},
+            nutrition_data={}, image_data={}, ingredients_data=[],
+        )
+        self.assertEqual(self.search(search='lasagne'), [])
+        self.assertEqual(self.search(search='moussaka'), [recipe])
+        delete_recipe(recipe)
+        self.assertEqual(search_index.rebuild_index(), 0)
+
+    def test_index_follows_direct_saves_and_cascades(self):
+        recipe = self.create_recipe('Lasagne', ingredients=['Pasta sheets'])
+        recipe.title = 'Moussaka'
+        recipe.save()
+        self.assertEqual(self.search(search='moussaka'), [recipe])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(recipe=recipe, name='Aubergine', quantity=1, unit=0)
+        self.assertEqual(self.search(search='aubergine'), [recipe])
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.ingredients.filter(name='Pasta sheets').delete()
+        self.assertEqual(self.search(search='pasta'), [])
+
+        self.user.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {search_index.SEARCH_TABLE}")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_cuisine_filter_only_matches_cuisine_column(self):
+        thai = self.create_recipe('Green Curry', cuisine='Thai')
+        self.create_recipe('Thai-style Toast', cuisine='British')
+        self.assertEqual(self.search(cuisine='thai'), [thai])
+
+    def test_fallback_without_index(self):
+        recipe = self.create_recipe('Paneer Tikka')
+        with mock.patch.object(search_index, 'is_available', return_value=False):
+            self.assertEqual(self.search(search='Paneer'), [recipe])
+
+
+class RecipeListCursorPaginationTest(RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_test_user()
+        self.recipes = [
+            self.create_test_recipe(author=self.user, category=Recipe.CategoryTypes.VEG)
+            for _ in range(15)
+        ]
+        self.newest_first = sorted(self.recipes, key=lambda r: (r.created, r.pk), reverse=True)
+        self.url = reverse("recipe:recipes")
+
+    def test_walks_pages_with_opaque_cursors(self):
+        response = self.client.get(self.url, {"pagination": "cursor"})
+        page = response.context["page_obj"]
+        self.assertEqual(list(page), self.newest_first[:12])
+        self.assertFalse(page.has_previous())
+
+        response = self.client.get(self.url, {"cursor": page.next_cursor})
+        page = response.context["page_obj"]
+        self.assertEqual(list(page), self.newest_first[12:])
+        self.assertFalse(page.has_next())
+
+        response = self.client.get(self.url, {"cursor": page.previous_cursor})
+        self.assertEqual(list(response.context["page_obj"]), self.newest_first[:12])
+
+    def test_skips_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {"pagination": "cursor"})
+        # The facet counts are one grouped query; the paginator's own count is what must go.
+        self.assertFalse(any('AS "__count"' in q["sql"] for q in queries.captured_queries))
+
+    def test_combines_with_filters(self):
+        vegan = self.create_test_recipe(author=self.user, category=Recipe.CategoryTypes.VEGAN)
+        response = self.client.get(
+            self.url, {"pagination": "cursor", "category": Recipe.CategoryTypes.VEGAN}
+        )
+        self.assertEqual(list(response.context["page_obj"]), [vegan])
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+
+class RecipeCoverImageTest(TemporaryMediaMixin, RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_test_user()
+
+    def test_domain_sets_cover_and_second_image(self):
+        recipe = self.create_test_recipe(author=self.user)
+        self.create_test_nutrition(recipe=recipe)
+        update_recipe_with_details(
+            recipe=recipe, user=self.user, recipe_data={}, nutrition_data={},
+            image_data={'image': SimpleUploadedFile('one.jpg', b'GIF87a')}, ingredients_data=[],
+        )
+        update_recipe_with_details(
+            recipe=recipe, user=self.user, recipe_data={}, nutrition_data={},
+            image_data={'image': SimpleUploadedFile('two.jpg', b'GIF87a')}, ingredients_data=[],
+        )
+        recipe.refresh_from_db()
+        first, second = recipe.images.order_by('created', 'id')
+        self.assertEqual(recipe.cover_image, first)
+        self.assertEqual(recipe.second_image, second)
+
+    def test_list_page_renders_without_image_queries(self):
+        for _ in range(12):
+            recipe = self.create_test_recipe(author=self.user)
+            self.create_test_image(recipe=recipe)
+            recipe.refresh_cover_images()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("recipe:recipes"))
+        self.assertEqual(len(response.context["recipes"]), 12)
+        self.assertFalse([
+            q for q in queries.captured_queries
+            if 'FROM "recipe_recipeimage"' in q["sql"]
+        ])
+
+    def test_saving_and_deleting_images_moves_the_cover(self):
+        recipe = self.create_test_recipe(author=self.user)
+        first, second, third = [self.create_test_image(recipe=recipe) for _ in range(3)]
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.cover_image, recipe.second_image), (first, second))
+
+        first.delete()
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.cover_image, recipe.second_image), (second, third))
+
+        second.delete()
+        third.delete()
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.cover_image, recipe.second_image), (None, None))
+
+    def test_backfill_command(self):
+        recipe = self.create_test_recipe(author=self.user)
+        image = self.create_test_image(recipe=recipe)
+        Recipe.objects.filter(pk=recipe.pk).update(cover_image=None)
+        call_command('backfill_cover_images', stdout=StringIO())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.cover_image, image)
+        self.assertIsNone(recipe.second_image)
+
+
+class RecipeImageAccessorQueryTest(TemporaryMediaMixin, RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_test_user()
+
+    def create_recipe_with_images(self, count):
+        recipe = self.create_test_recipe(author=self.user)
+        self.create_test_nutrition(recipe=recipe)
+        for _ in range(count):
+            self.create_test_image(recipe=recipe)
+        recipe.refresh_cover_images()
+        return recipe
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries)
+
+    def test_accessors_use_prefetched_images(self):
+        recipe = self.create_recipe_with_images(4)
+        recipe = Recipe.objects.prefetch_related(ordered_images_prefetch()).get(pk=recipe.pk)
+        images = list(recipe.images.order_by('created', 'id'))
+        with self.assertNumQueries(0):
+            self.assertEqual(recipe.get_first_image_url(), images[0].image.url)
+            self.assertEqual(recipe.get_second_image_url(), images[1].image.url)
+            self.assertEqual(recipe.get_remaining_image(), images[2:])
+
+    def test_accessors_without_images(self):
+        recipe = Recipe.objects.prefetch_related(ordered_images_prefetch()).get(
+            pk=self.create_recipe_with_images(0).pk
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(recipe.get_first_image_url(), recipe.default_recipe_image_url())
+            self.assertEqual(recipe.get_second_image_url(), recipe.default_recipe_image_url())
+            self.assertIsNone(recipe.get_remaining_image())
+
+    def test_detail_page_queries_do_not_grow_with_images(self):
+        one = self.create_recipe_with_images(1)
+        many = self.create_recipe_with_images(6)
+        self.assertEqual(
+            self.count_queries(one.get_absolute_url()),
+            self.count_queries(many.get_absolute_url()),
+        )
+
+    def test_list_page_queries_do_not_grow_with_recipes(self):
+        self.create_recipe_with_images(2)
+        baseline = self.count_queries(reverse("recipe:recipes"))
+        for _ in range(5):
+            self.create_recipe_with_images(2)
+        self.assertEqual(self.count_queries(reverse("recipe:recipes")), baseline)
+
+
+class ImageRenditionTest(TemporaryMediaMixin, RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_test_user()
+        self.recipe = self.create_test_recipe(author=self.user)
+        self.create_test_nutrition(recipe=self.recipe)
+
+    def png_upload(self, name='dish.png', size=(1600, 900)):
+        buffer = BytesIO()
+        Image.new('RGBA', size, (200, 80, 20, 255)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_upload_renders_renditions_next_to_original_after_the_request(self):
+        with mock.patch.object(renditions._executor, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                update_recipe_with_details(
+                    recipe=self.recipe, user=self.user, recipe_data={}, nutrition_data={},
+                    image_data={'image': self.png_upload()}, ingredients_data=[],
+                )
+        image = RecipeImage.objects.get(recipe=self.recipe)
+        self.assertEqual(image.renditions, {})
+        submit.assert_called_once_with(renditions._run_in_background, RecipeImage, image.pk)
+
+        renditions.refresh_by_pk(RecipeImage, image.pk)
+        image.refresh_from_db()
+        self.assertEqual(set(image.renditions), set(RENDITION_SIZES))
+        card = image.renditions['card']
+        self.assertEqual(card['width'], RENDITION_SIZES['card'])
+        self.assertTrue(card['webp'].startswith(f'recipes/{self.recipe.pk}/'))
+        self.assertTrue(image.image.storage.exists(card['jpeg']))
+        self.assertIn(' 480w', image.srcset())
+        self.assertTrue(image.rendition_url('thumb').endswith('_thumb.jpeg'))
+
+    def test_replacing_the_file_drops_stale_renditions(self):
+        image = self.create_test_image(recipe=self.recipe, image=self.png_upload())
+        old = refresh_renditions(image)
+        image = RecipeImage.objects.get(pk=image.pk)
+        image.image = self.png_upload(name='new.png')
+        with mock.patch.object(renditions._executor, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                image.save()
+        submit.assert_called_once_with(renditions._run_in_background, RecipeImage, image.pk)
+        image.refresh_from_db()
+        self.assertEqual(image.renditions, {})
+        self.assertEqual(image.rendition_url('card'), image.image.url)
+        self.assertFalse(image.image.storage.exists(old['card']['jpeg']))
+
+        with mock.patch.object(renditions._executor, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                image.save()
+        submit.assert_not_called()
+
+    def test_small_originals_are_not_upscaled(self):
+        image = self.create_test_image(recipe=self.recipe, image=self.png_upload(size=(300, 200)))
+        stored = refresh_renditions(image)
+        self.assertEqual(stored['hero']['width'], 300)
+        self.assertEqual(image.srcset().count('300w'), 1)
+
+    def test_unreadable_upload_falls_back_to_original(self):
+        image = self.create_test_image(recipe=self.recipe)
+        self.assertEqual(refresh_renditions(image), {})
+        self.assertEqual(image.rendition_url('card'), image.image.url)
+        self.assertEqual(image.srcset(), '')
+
+    def test_backfill_command(self):
+        image = self.create_test_image(recipe=self.recipe, image=self.png_upload())
+        call_command('generate_renditions', workers=1, stdout=StringIO())
+        image.refresh_from_db()
+        self.assertEqual(set(image.renditions), set(RENDITION_SIZES))
+
+
+class ToggleLikeTest(RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_test_user()
+        self.client.force_login(self.user)
+        self.recipe = self.create_test_recipe()
+        self.url = reverse("recipe:toggle_like", kwargs={"pk": self.recipe.pk})
+
+    def test_like_and_unlike_maintain_counter(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.json(), {"liked": True, "total_likes": 1})
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.likes, 1)
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.json(), {"liked": False, "total_likes": 0})
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.likes, 0)
+
+    def test_concurrent_like_does_not_raise_or_double_count(self):
+        RecipeLike.objects.create(user=self.user, recipe=self.recipe)
+        with mock.patch.object(RecipeLike.objects, "filter") as like_filter:
+            # Simulate a second request racing past the existence check.
+            like_filter.return_value.values_list.return_value.first.return_value = None
+            liked, total = toggle_like(self.user, self.recipe)
+        self.assertTrue(liked)
+        self.assertEqual(total, 0)
+        self.assertEqual(RecipeLike.objects.filter(recipe=self.recipe).count(), 1)
+
+    def test_unlike_with_drifted_counter_is_logged(self):
+        RecipeLike.objects.create(user=self.user, recipe=self.recipe)
+        with self.assertLogs("recipe.signals", "ERROR"):
+            liked, total = toggle_like(self.user, self.recipe)
+        self.assertEqual((liked, total), (False, 0))
+
+    def test_deleting_an_account_uncounts_its_likes(self):
+        toggle_like(self.user, self.recipe)
+        other = self.create_test_user()
+        toggle_like(other, self.recipe)
+        self.assertGreater(RecipeTrend.objects.get(recipe=self.recipe).score, 0)
+
+        self.user.delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.likes, 1)
+        other.delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.likes, 0)
+        score = RecipeTrend.objects.get(recipe=self.recipe).score
+        self.assertAlmostEqual(trending.current_score(score), 0)
+
+    def test_deleting_a_liked_recipe_skips_the_counter(self):
+        toggle_like(self.user, self.recipe)
+        with self.assertNoLogs("recipe.signals", "ERROR"):
+            self.recipe.delete()
+        self.assertFalse(RecipeTrend.objects.exists())
+
+    def test_migration_counts_existing_likes(self):
+        RecipeLike.objects.create(user=self.user, recipe=self.recipe)
+        other = self.create_test_recipe(likes=3)
+        migration = import_module("recipe.migrations.0014_backfill_recipe_likes")
+        migration.count_likes(django_apps, None)
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.recipe.likes, other.likes), (1, 0))
+
+    def test_reconcile_command_repairs_drift(self):
+        other = self.create_test_recipe(likes=7)
+        RecipeLike.objects.create(user=self.user, recipe=self.recipe)
+        out = StringIO()
+        call_command("reconcile_like_counts", batch_size=1, stdout=out)
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.recipe.likes, other.likes), (1, 0))
+        self.assertIn("2 recipes", out.getvalue())
+
+
+class TrendingTest(RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [self.create_test_user() for _ in range(3)]
+        self.recipes = [self.create_test_recipe() for _ in range(3)]
+
+    def popular(self):
+        return list(self.client.get(reverse("recipe:home")).context["popular_recipes"])
+
+    def test_likes_update_trending_incrementally(self):
+        old, new, unliked = self.recipes
+        toggle_like(self.users[0], old)
+        toggle_like(self.users[1], old)
+        toggle_like(self.users[0], new)
+        toggle_like(self.users[1], new)
+        toggle_like(self.users[2], new)
+        toggle_like(self.users[0], unliked)
+        toggle_like(self.users[0], unliked)
+        self.assertEqual(trending.popular_recipe_ids(5), [new.pk, old.pk])
+        self.assertEqual(RecipeTrend.objects.get(recipe=unliked).score, 0)
+        self.assertEqual(self.popular()[:2], [new, old])
+
+    def test_recent_likes_outrank_older_ones(self):
+        old, new, _ = self.recipes
+        now = timezone.now()
+        for user in self.users:
+            trending.record_like(old.pk, now - trending.HALF_LIFE * 3)
+        trending.record_like(new.pk, now)
+        self.assertEqual(trending.popular_recipe_ids(2), [new.pk, old.pk])
+        self.assertAlmostEqual(
+            trending.current_score(RecipeTrend.objects.get(recipe=old).score, now), 3 / 8
+        )
+
+    def test_refresh_command_recomputes_and_prunes(self):
+        fresh, stale, _ = self.recipes
+        RecipeLike.objects.create(user=self.users[0], recipe=fresh)
+        like = RecipeLike.objects.create(user=self.users[0], recipe=stale)
+        RecipeLike.objects.filter(pk=like.pk).update(created=timezone.now() - trending.WINDOW * 2)
+        RecipeTrend.objects.create(recipe=stale, score=99)
+        call_command("refresh_trending", stdout=StringIO())
+        self.assertEqual(list(RecipeTrend.objects.values_list("recipe_id", flat=True)), [fresh.pk])
+
+    def test_homepage_falls_back_to_most_liked(self):
+        self.assertEqual(len(self.popular()), 3)
+
+    def test_scores_stay_finite_a_decade_after_epoch(self):
+        recipe, other, _ = self.recipes
+        far = trending.EPOCH + timedelta(days=3653)
+        for user, when in ((self.users[0], far), (self.users[1], far + trending.HALF_LIFE)):
+            like = RecipeLike.objects.create(user=user, recipe=recipe)
+            RecipeLike.objects.filter(pk=like.pk).update(created=when)
+            trending.record_like(recipe.pk, when)
+        trending.record_like(other.pk, far + trending.HALF_LIFE)
+
+        score = RecipeTrend.objects.get(recipe=recipe).score
+        self.assertLess(score, 2 ** 20)
+        self.assertAlmostEqual(trending.current_score(score, far + trending.HALF_LIFE), 1.5)
+        self.assertEqual(trending.popular_recipe_ids(2), [recipe.pk, other.pk])
+
+        trending.recompute(now=far + trending.HALF_LIFE * 2)
+        score = RecipeTrend.objects.get(recipe=recipe).score
+        self.assertAlmostEqual(trending.current_score(score, far + trending.HALF_LIFE * 2), 0.75)
+
+
+class HomePageCacheTest(RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_test_user()
+        self.recipes = [self.create_test_recipe() for _ in range(6)]
+        self.url = reverse("recipe:home")
+
+    def recipe_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [q for q in queries.captured_queries if 'FROM "recipe_recipe"' in q["sql"]]
+
+    def test_second_visit_is_served_from_cache(self):
+        self.assertTrue(self.recipe_queries())
+        self.assertEqual(self.recipe_queries(), [])
+
+    def test_like_invalidates_popular_fragment(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            toggle_like(self.user, self.recipes[0])
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["popular_recipes"][0], self.recipes[0])
+
+    def test_changes_to_recipes_not_shown_keep_the_cache(self):
+        self.client.get(self.url)
+        hidden = self.recipes[0]
+        self.assertNotIn(hidden, self.client.get(self.url).context["latest_recipes"])
+        hidden.title = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            hidden.save()
+        self.assertEqual(self.recipe_queries(), [])
+        shown = self.recipes[-1]
+        shown.title = "Renamed too"
+        with self.captureOnCommitCallbacks(execute=True):
+            shown.save()
+        self.assertTrue(self.recipe_queries())
+
+    def test_new_recipe_invalidates_latest_fragment(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.create_test_recipe()
+        self.assertEqual(self.client.get(self.url).context["latest_recipes"][0], recipe)
+
+    def test_invalidation_waits_for_commit(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.create_test_recipe()
+            self.assertEqual(self.recipe_queries(), [])
+        for callback in callbacks:
+            callback()
+        self.assertTrue(self.recipe_queries())
+
+    def test_stale_value_served_while_another_request_recomputes(self):
+        compute = mock.Mock(return_value="fresh")
+        caching.get_or_compute("stampede", lambda: "stale")
+        caching.invalidate("stampede")
+        cache.add("stampede:lock", 1)
+        self.assertEqual(caching.get_or_compute("stampede", compute), "stale")
+        compute.assert_not_called()
+        cache.delete("stampede:lock")
+        self.assertEqual(caching.get_or_compute("stampede", compute), "fresh")
+
+
+class RecipeDetailConditionalGetTest(TemporaryMediaMixin, RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_test_user()
+        self.recipe = self.create_test_recipe(author=self.user)
+        self.create_test_nutrition(recipe=self.recipe)
+        self.url = self.recipe.get_absolute_url()
+
+    def test_repeat_visit_gets_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        # A max() of timestamps would move backwards on unlikes and image deletes.
+        self.assertFalse(response.has_header("Last-Modified"))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_with_likes_images_and_edits(self):
+        etags = {self.client.get(self.url)["ETag"]}
+        toggle_like(self.create_test_user(), self.recipe)
+        etags.add(self.client.get(self.url)["ETag"])
+        self.create_test_image(recipe=self.recipe)
+        etags.add(self.client.get(self.url)["ETag"])
+        self.recipe.title = "Edited"
+        self.recipe.save()
+        etags.add(self.client.get(self.url)["ETag"])
+        self.assertEqual(len(etags), 4)
+
+    def test_unlike_and_image_delete_invalidate_the_cached_copy(self):
+        liker = self.create_test_user()
+        toggle_like(liker, self.recipe)
+        image = self.create_test_image(recipe=self.recipe)
+        etag = self.client.get(self.url)["ETag"]
+        toggle_like(liker, self.recipe)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        image.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_differs_per_viewer(self):
+        anonymous = self.client.get(self.url)["ETag"]
+        self.client.force_login(self.user)
+        self.assertNotEqual(self.client.get(self.url)["ETag"], anonymous)
+
+    def test_missing_recipe_is_404(self):
+        response = self.client.get(reverse("recipe:recipe_detail", kwargs={"pk": 0}))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(RECIPE_PAGE_CACHE_TIMEOUT=60)
+    def test_anonymous_page_cache(self):
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.recipe.title = "Changed title"
+        self.recipe.save()
+        self.assertContains(self.client.get(self.url), "Changed title")
+
+
+class RecipeDetailLoaderTest(TemporaryMediaMixin, RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_test_user()
+        self.client.force_login(self.user)
+
+    def create_recipe(self, images, ingredients):
+        recipe = self.create_test_recipe()
+        self.create_test_nutrition(recipe=recipe)
+        for _ in range(images):
+            self.create_test_image(recipe=recipe)
+        for _ in range(ingredients):
+            self.create_test_ingredient(recipe=recipe)
+        recipe.refresh_cover_images()
+        return recipe
+
+    def get(self, recipe):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(recipe.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries.captured_queries)
+
+    def test_fixed_number_of_queries(self):
+        _, small = self.get(self.create_recipe(images=1, ingredients=1))
+        _, large = self.get(self.create_recipe(images=8, ingredients=25))
+        self.assertEqual(small, large)
+        # session + user, ETag version, recipe with joins, images, ingredients, similar recipes
+        self.assertEqual(large, 7)
+
+    def test_liked_flag_comes_from_annotation(self):
+        recipe = self.create_recipe(images=0, ingredients=0)
+        self.assertFalse(self.get(recipe)[0].context["liked"])
+        toggle_like(self.user, recipe)
+        self.assertTrue(self.get(recipe)[0].context["liked"])
+
+
+class InstructionStepsTest(RecipeTestDataMixin, TestCase):
+    def test_parser_keeps_decimals_and_detects_timers(self):
+        steps = parse_instructions("1. Whisk 1.5 cups milk. Simmer for 10-12 minutes.\n2) Rest 1 hour")
+        self.assertEqual(
+            [step["text"] for step in steps],
+            ["Whisk 1.5 cups milk", "Simmer for 10-12 minutes", "Rest 1 hour"],
+        )
+        self.assertEqual(steps[0]["timers"], [])
+        self.assertEqual(steps[1]["timers"], [{"label": "10-12 minutes", "seconds": 720}])
+        self.assertEqual(steps[2]["timers"], [{"label": "1 hour", "seconds": 3600}])
+
+    def test_domain_functions_store_steps(self):
+        user = self.create_test_user()
+        recipe = self.create_test_recipe(author=user)
+        self.create_test_nutrition(recipe=recipe)
+        update_recipe_with_details(
+            recipe=recipe, user=user, recipe_data={"instructions": "Boil. Drain."},
+            nutrition_data={}, image_data={}, ingredients_data=[],
+        )
+        recipe.refresh_from_db()
+        self.assertEqual([step["text"] for step in recipe.steps], ["Boil", "Drain"])
+
+    def test_any_save_reparses_changed_instructions(self):
+        recipe = self.create_test_recipe(instructions="Chop. Fry.")
+        self.assertEqual([step["text"] for step in recipe.steps], ["Chop", "Fry"])
+        recipe.instructions = "Bake for 20 minutes."
+        recipe.save(update_fields=["instructions"])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.steps, [{"text": "Bake for 20 minutes", "timers": [{"label": "20 minutes", "seconds": 1200}]}])
+
+    def test_detail_view_reads_stored_steps(self):
+        recipe = self.create_test_recipe(instructions="ignored")
+        Recipe.objects.filter(pk=recipe.pk).update(steps=[{"text": "Stored step", "timers": []}])
+        recipe.refresh_from_db()
+        self.create_test_nutrition(recipe=recipe)
+        response = self.client.get(recipe.get_absolute_url())
+        self.assertEqual(response.context["instructions"], recipe.steps)
+        self.assertContains(response, "Stored step")
+
+
+class IngredientDiffUpdateTest(RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_test_user()
+        self.recipe = self.create_test_recipe(author=self.user, title="Dal")
+        self.create_test_nutrition(recipe=self.recipe, calories=100)
+        self.salt = self.create_test_ingredient(recipe=self.recipe, name="Salt", quantity=1, unit=0, optional=False)
+        self.oil = self.create_test_ingredient(recipe=self.recipe, name="Oil", quantity=2, unit=0, optional=False)
+
+    def submitted(self, overrides=None):
+        rows = {
+            ingredient.pk: {
+                "id": ingredient, "name": ingredient.name, "quantity": ingredient.quantity,
+                "unit": ingredient.unit, "optional": ingredient.optional,
+            }
+            for ingredient in (self.salt, self.oil)
+        }
+        for pk, changes in (overrides or {}).items():
+            rows[pk].update(changes)
+        return list(rows.values())
+
+    def update(self, ingredients_data, recipe_data=None, nutrition_data=None):
+        with CaptureQueriesContext(connection) as queries:
+            update_recipe_with_details(
+                recipe=self.recipe, user=self.user, recipe_data=recipe_data or {},
+                nutrition_data=nutrition_data or {}, image_data={},
+                ingredients_data=ingredients_data,
+            )
+        return [
+            q["sql"].split()[0] for q in queries.captured_queries
+            if q["sql"].split()[0] in ("INSERT", "UPDATE", "DELETE")
+        ]
+
+    def test_unchanged_submission_writes_nothing(self):
+        self.assertEqual(
+            self.update(self.submitted(), recipe_data={"title": "Dal"}, nutrition_data={"calories": 100}),
+            [],
+        )
+
+    def test_title_change_keeps_ingredient_rows(self):
+        writes = self.update(self.submitted(), recipe_data={"title": "Tadka Dal"})
+        self.assertEqual(sorted(set(writes)), ["DELETE", "INSERT", "UPDATE"])  # recipe + search row
+        self.assertEqual(
+            set(Ingredient.objects.filter(recipe=self.recipe).values_list("pk", flat=True)),
+            {self.salt.pk, self.oil.pk},
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, "Tadka Dal")
+
+    def test_diff_updates_creates_and_deletes(self):
+        rows = self.submitted({self.salt.pk: {"name": "Rock Salt"}})
+        rows = [row for row in rows if row["id"] != self.oil] + [
+            {"name": "Ghee", "quantity": 1, "unit": "0", "optional": True}
+        ]
+        self.update(rows)
+        ingredients = Ingredient.objects.filter(recipe=self.recipe).order_by("pk")
+        self.assertEqual([i.name for i in ingredients], ["Rock Salt", "Ghee"])
+        self.assertEqual(ingredients[0].pk, self.salt.pk)
+
+    def test_removing_ingredients_costs_the_same_for_one_or_many(self):
+        def removal_queries(removed):
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe = self.create_test_recipe(author=self.user)
+                self.create_test_nutrition(recipe=recipe)
+                for i in range(20):
+                    self.create_test_ingredient(recipe=recipe, name=f"Spice {i}")
+            kept = [
+                {"id": i, "name": i.name, "quantity": i.quantity, "unit": i.unit, "optional": i.optional}
+                for i in recipe.ingredients.order_by("pk")[removed:]
+            ]
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                update_recipe_with_details(
+                    recipe=recipe, user=self.user, recipe_data={}, nutrition_data={},
+                    image_data={}, ingredients_data=kept,
+                )
+            return len(queries)
+
+        self.assertEqual(removal_queries(1), removal_queries(19))
+
+    def test_deleting_a_recipe_costs_the_same_for_any_number_of_ingredients(self):
+        def delete_queries(ingredients):
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe = self.create_test_recipe(author=self.user)
+                for i in range(ingredients):
+                    self.create_test_ingredient(recipe=recipe, name=f"Spice {i}")
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                delete_recipe(recipe)
+            return len(queries)
+
+        self.assertEqual(delete_queries(1), delete_queries(40))
+
+    def test_changes_bump_modified(self):
+        before = Recipe.objects.get(pk=self.recipe.pk).modified
+        self.update(self.submitted({self.oil.pk: {"quantity": 5}}))
+        self.assertGreater(Recipe.objects.get(pk=self.recipe.pk).modified, before)
+
+
+class ImportRecipesCommandTest(RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_test_user(username="partner")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def row(self, title, **overrides):
+        row = {
+            "title": title, "category": 0, "difficulty": 1, "cuisine": "Indian",
+            "servings": 2, "prep_time": 10, "total_time": 30,
+            "instructions": "Boil the rice. Simmer for 10 minutes.",
+            "nutrition": {"calories": 400, "protein": 10, "fat": 5, "sugar": 2, "fiber": 3, "carbohydrates": 60},
+            "ingredients": [
+                {"name": "Rice", "quantity": "200", "unit": 0},
+                {"name": "Salt", "quantity": "1", "unit": 2, "optional": True},
+            ],
+        }
+        row.update(overrides)
+        return row
+
+    def write(self, name, lines):
+        path = f"{self.directory.name}/{name}"
+        with open(path, "w") as stream:
+            stream.write("\n".join(lines) + "\n")
+        return path
+
+    def run_import(self, path, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            "import_recipes", path, "--author", "partner", "--workers", "0", *args,
+            stdout=stdout, stderr=stderr,
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_imports_valid_rows_and_reports_rejected_ones(self):
+        self.create_test_recipe(author=self.user, title="Existing")
+        path = self.write("catalogue.jsonl", [
+            json.dumps(self.row("Jeera Rice")),
+            json.dumps(self.row("Too Quick", prep_time=60, total_time=30)),
+            "{not json",
+            json.dumps(self.row("Existing")),
+            json.dumps(self.row("Lemon Rice", ingredients=[{"name": "Lemon", "quantity": "1", "unit": 99}])),
+            json.dumps(self.row("Curd Rice")),
+        ])
+
+        stdout, stderr = self.run_import(path, "--batch-size", "2")
+
+        self.assertIn("Imported 2 recipes, rejected 4 rows", stdout)
+        self.assertIn("rows/s", stdout)
+        self.assertIn("Line 2: Total time cannot be less than prep time.", stderr)
+        self.assertIn("Line 3: Malformed row", stderr)
+        self.assertIn("Line 4: title: You already have a recipe with this title.", stderr)
+        self.assertIn("Line 5: ingredients[0].unit:", stderr)
+
+        recipe = Recipe.objects.get(title="Jeera Rice")
+        self.assertEqual(recipe.author, self.user)
+        self.assertEqual(recipe.nutrition.calories, 400)
+        self.assertEqual(
+            list(recipe.ingredients.order_by("pk").values_list("name", "unit", "optional")),
+            [("Rice", 0, False), ("Salt", 2, True)],
+        )
+        self.assertEqual(recipe.steps[1]["timers"][0]["seconds"], 600)
+        self.assertTrue(Recipe.objects.filter(title="Curd Rice").exists())
+        if search_index.is_available():
+            self.assertEqual(
+                set(search_index.filter_queryset(Recipe.objects.all(), "rice").values_list("title", flat=True)),
+                {"Jeera Rice", "Curd Rice"},
+            )
+
+    def test_resumes_from_checkpoint(self):
+        checkpoint = f"{self.directory.name}/checkpoint.json"
+        lines = [json.dumps(self.row(f"Recipe {i}")) for i in range(3)]
+        self.run_import(self.write("first.jsonl", lines), "--checkpoint", checkpoint, "--batch-size", "2")
+        with open(checkpoint) as stream:
+            self.assertEqual(json.load(stream), {"line": 3})
+
+        lines.append(json.dumps(self.row("Recipe 3")))
+        stdout, stderr = self.run_import(self.write("second.jsonl", lines), "--checkpoint", checkpoint)
+
+        self.assertIn("Resuming after line 3.", stdout)
+        self.assertEqual(stderr, "")
+        self.assertEqual(Recipe.objects.filter(author=self.user).count(), 4)
+
+    def test_imports_csv(self):
+        header = "title,category,difficulty,cuisine,servings,prep_time,total_time,instructions," \
+                 "calories,protein,fat,sugar,fiber,carbohydrates,ingredients"
+        ingredients = json.dumps([{"name": "Oats", "quantity": "50", "unit": 0}]).replace('"', '""')
+        path = self.write("catalogue.csv", [
+            header,
+            f'Porridge,1,0,British,1,5,10,"Stir the oats.\nServe hot.",300,8,5,4,6,50,"{ingredients}"',
+        ])
+
+        stdout, _ = self.run_import(path)
+
+        self.assertIn("Imported 1 recipes", stdout)
+        recipe = Recipe.objects.get(title="Porridge")
+        self.assertEqual(len(recipe.steps), 2)
+        self.assertEqual(list(recipe.ingredients.values_list("name", flat=True)), ["Oats"])
+
+    def test_statement_count_per_batch_is_constant(self):
+        def statements(count, prefix):
+            rows = [(i, json.dumps(self.row(f"{prefix} {i}"))) for i in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                list(importing.import_recipes(rows, self.user, batch_size=count))
+            return len(queries)
+
+        self.assertEqual(statements(2, "Small"), statements(30, "Large"))
+
+
+class ExportRecipesTest(TemporaryMediaMixin, RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        self.author = self.create_test_user(username="chef")
+        self.recipe = self.create_test_recipe(author=self.author, title="Khichdi", category=0)
+        self.create_test_nutrition(recipe=self.recipe, calories=320)
+        self.create_test_ingredient(recipe=self.recipe, name="Rice", quantity="1.50", unit=4, optional=False)
+        self.create_test_image(recipe=self.recipe)
+        self.other = self.create_test_recipe(title="Chilli Chicken", category=2)
+        self.create_test_nutrition(recipe=self.other)
+
+    def export(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command("export_recipes", "--chunk-size", "1", *args, stdout=stdout, stderr=stderr)
+        return [json.loads(line) for line in stdout.getvalue().splitlines()], stderr.getvalue()
+
+    def test_command_exports_nested_recipes(self):
+        rows, stderr = self.export("--base-url", "https://tastora.example/")
+        self.assertEqual([row["title"] for row in rows], ["Khichdi", "Chilli Chicken"])
+        self.assertIn("Exported 2 recipes.", stderr)
+        khichdi = rows[0]
+        self.assertEqual(khichdi["author"], "chef")
+        self.assertEqual(khichdi["nutrition"]["calories"], 320)
+        self.assertEqual(
+            khichdi["ingredients"],
+            [{"name": "Rice", "quantity": "1.50", "unit": 4, "optional": False}],
+        )
+        self.assertTrue(khichdi["images"][0]["url"].startswith("https://tastora.example/"))
+
+    def test_command_filters(self):
+        rows, _ = self.export("--author", "chef")
+        self.assertEqual([row["id"] for row in rows], [self.recipe.pk])
+        rows, _ = self.export("--category", "2")
+        self.assertEqual([row["id"] for row in rows], [self.other.pk])
+
+        Recipe.objects.filter(pk=self.other.pk).update(modified=timezone.now() - timedelta(days=3))
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        rows, _ = self.export("--modified-since", since)
+        self.assertEqual([row["id"] for row in rows], [self.recipe.pk])
+
+        toggle_like(self.author, self.other)
+        rows, _ = self.export("--modified-since", since)
+        self.assertEqual([row["id"] for row in rows], [self.recipe.pk, self.other.pk])
+        self.assertEqual(rows[1]["likes"], 1)
+
+        with self.assertRaises(CommandError):
+            self.export("--modified-since", "yesterday")
+
+    def test_export_can_be_imported(self):
+        rows, _ = self.export("--author", "chef")
+        importer = self.create_test_user(username="mirror")
+        parsed = [importing.parse_row((1, json.dumps(rows[0])))]
+        self.assertEqual(parsed[0][2], [])
+        list(importing.import_recipes([(1, json.dumps(rows[0]))], importer))
+        copy = Recipe.objects.get(author=importer)
+        self.assertEqual(copy.title, "Khichdi")
+        self.assertEqual(list(copy.ingredients.values_list("name", flat=True)), ["Rice"])
+
+    def test_endpoint_is_staff_only(self):
+        self.client.force_login(self.author)
+        response = self.client.get(reverse("recipe:export_recipes"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_endpoint_streams_ndjson(self):
+        staff = self.create_test_user(username="staff", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse("recipe:export_recipes"), {"category": "0"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["title"] for row in rows], ["Khichdi"])
+        self.assertTrue(rows[0]["images"][0]["url"].startswith("http://testserver/"))
+
+        response = self.client.get(reverse("recipe:export_recipes"), {"category": "9"})
+        self.assertEqual(response.status_code, 400)
+
+
+class RecipeApiTest(TemporaryMediaMixin, RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        self.author = self.create_test_user(username="chef")
+        self.recipes = []
+        for i in range(5):
+            recipe = self.create_test_recipe(author=self.author, title=f"Recipe {i}", category=i % 2, likes=i)
+            self.create_test_nutrition(recipe=recipe)
+            self.create_test_ingredient(recipe=recipe, name=f"Ingredient {i}")
+            self.recipes.append(recipe)
+        self.create_test_image(recipe=self.recipes[-1])
+        self.recipes[-1].refresh_cover_images()
+
+    def get(self, name, params=None, **kwargs):
+        return self.client.get(reverse(name, kwargs=kwargs), params or {})
+
+    def test_list_sparse_fields_select_only_what_is_requested(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get("recipe:api_recipes", {"fields": "title,cover,likes"})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(set(results[0]), {"title", "cover", "likes"})
+        self.assertEqual(results[0]["title"], "Recipe 4")
+        self.assertTrue(results[0]["cover"].startswith("http://testserver/"))
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]["sql"]
+        self.assertIn('"recipe_recipeimage"', sql)
+        self.assertNotIn('"instructions"', sql)
+        self.assertNotIn('"recipe_nutrition"', sql)
+
+    def test_list_nested_fields_are_prefetched(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get("recipe:api_recipes", {"fields": "id,nutrition,ingredients,images"})
+        results = response.json()["results"]
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[-1]["ingredients"][0]["name"], "Ingredient 0")
+        self.assertEqual(len(queries), 3)
+
+    def test_list_filters_and_cursor_pagination(self):
+        response = self.get("recipe:api_recipes", {"fields": "title", "category": "0", "page_size": "2"})
+        body = response.json()
+        self.assertEqual([row["title"] for row in body["results"]], ["Recipe 4", "Recipe 2"])
+        self.assertIsNone(body["previous"])
+
+        response = self.get("recipe:api_recipes", {"fields": "title", "category": "0", "page_size": "2", "cursor": body["next"]})
+        body = response.json()
+        self.assertEqual([row["title"] for row in body["results"]], ["Recipe 0"])
+        self.assertIsNone(body["next"])
+        self.assertIsNotNone(body["previous"])
+
+    def test_invalid_cursor_is_a_json_400(self):
+        response = self.client.get(reverse("recipe:api_recipes"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Invalid cursor."})
+
+    def test_list_etag(self):
+        response = self.get("recipe:api_recipes", {"fields": "title"})
+        etag = response["ETag"]
+        response = self.client.get(reverse("recipe:api_recipes"), {"fields": "title"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(title="Renamed")
+        response = self.client.get(reverse("recipe:api_recipes"), {"fields": "title"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get("recipe:api_recipes", {"fields": "title,secret"}).status_code, 400)
+        self.assertEqual(self.get("recipe:api_recipes", {"category": "7"}).status_code, 400)
+        response = self.get("recipe:api_recipes", {"page_size": "x"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "page_size must be an integer."})
+
+    def test_detail_defaults_to_all_fields_and_supports_etag(self):
+        recipe = self.recipes[-1]
+        response = self.get("recipe:api_recipe_detail", pk=recipe.pk)
+        body = response.json()
+        self.assertEqual(body["author"], "chef")
+        self.assertEqual(body["ingredients"][0]["name"], "Ingredient 4")
+        self.assertEqual(len(body["images"]), 1)
+
+        url = reverse("recipe:api_recipe_detail", kwargs={"pk": recipe.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+        sparse = self.client.get(url, {"fields": "title"})
+        self.assertEqual(sparse.json(), {"title": recipe.title})
+        self.assertNotEqual(sparse["ETag"], response["ETag"])
+
+    def test_detail_missing(self):
+        self.assertEqual(self.get("recipe:api_recipe_detail", pk=999).status_code, 404)
+
+
+class IngredientIndexTest(RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_test_user()
+        self.nutrition = {"calories": 1, "protein": 1, "fat": 1, "sugar": 1, "fiber": 1, "carbohydrates": 1}
+
+    def create(self, title, *ingredients):
+        create_recipe_with_details(
+            user=self.user,
+            recipe_data={
+                "title": title, "category": 0, "difficulty": 0, "cuisine": "Italian",
+                "servings": 2, "prep_time": 5, "total_time": 20, "instructions": "Cook.",
+            },
+            nutrition_data=self.nutrition,
+            image_data={},
+            ingredients_data=[{"name": name, "quantity": 1, "unit": 0} for name in ingredients],
+        )
+        return Recipe.objects.get(title=title)
+
+    def test_canonical_terms(self):
+        self.assertEqual(pantry.canonical_name("  Fresh TOMATOES!"), "fresh tomato")
+        self.assertEqual(pantry.canonical_name("Berries"), "berry")
+        self.assertEqual(pantry.canonical_name("Peaches"), "peach")
+        self.assertEqual(pantry.canonical_name("Hummus"), "hummus")
+        self.assertIn("olive oil", pantry.terms_for("Extra Virgin Olive Oils"))
+        self.assertEqual(pantry.query_terms("Tomatoes, tomato ,, basil"), ["tomato", "basil"])
+
+    def test_ranks_by_ingredients_covered(self):
+        bruschetta = self.create("Bruschetta", "Cherry Tomatoes", "Basil leaves", "Olive Oil")
+        caprese = self.create("Caprese", "Tomato", "Mozzarella")
+        self.create("Risotto", "Rice", "Butter")
+
+        results = pantry.rank_by_ingredients(Recipe.objects.all(), "tomatoes, basil, extra virgin olive oil")
+        self.assertEqual([(r.title, r.ingredient_matches) for r in results], [("Bruschetta", 2), ("Caprese", 1)])
+
+        results = pantry.rank_by_ingredients(Recipe.objects.all(), "olive oil, tomato")
+        self.assertEqual([r.pk for r in results], [bruschetta.pk, caprese.pk])
+
+    def test_search_uses_index_not_ingredient_scans(self):
+        self.create("Caprese", "Tomato", "Mozzarella")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("recipe:recipes"), {"ingredients": "tomato, mozzarella"})
+        self.assertContains(response, "Uses 2 of your ingredients")
+        self.assertFalse([q for q in queries.captured_queries if '"recipe_ingredient"' in q["sql"]])
+
+    def test_direct_ingredient_writes_maintain_index(self):
+        recipe = self.create("Dal", "Lentils")
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(recipe=recipe, name="Cumin seeds", quantity=1, unit=0)
+            recipe.ingredients.filter(name="Lentils").delete()
+        self.assertEqual(
+            set(IngredientTerm.objects.filter(recipe=recipe).values_list("term", flat=True)),
+            {"cumin", "seed", "cumin seed"},
+        )
+
+    def test_domain_functions_maintain_index(self):
+        recipe = self.create("Dal", "Lentils", "Salt")
+        self.assertTrue(IngredientTerm.objects.filter(recipe=recipe, term="lentil").exists())
+
+        lentils = recipe.ingredients.get(name="Lentils")
+        update_recipe_with_details(
+            recipe=recipe, user=self.user, recipe_data={}, nutrition_data={}, image_data={},
+            ingredients_data=[{"id": lentils.pk, "name": "Red Lentils", "quantity": 1, "unit": 0}],
+        )
+        self.assertEqual(
+            set(IngredientTerm.objects.filter(recipe=recipe).values_list("term", flat=True)),
+            {"red", "lentil", "red lentil"},
+        )
+
+        delete_recipe(recipe)
+        self.assertFalse(IngredientTerm.objects.exists())
+
+    def test_rebuild_command(self):
+        recipe = self.create_test_recipe(author=self.user)
+        self.create_test_ingredient(recipe=recipe, name="Green Chillies")
+        call_command("rebuild_ingredient_index", stdout=StringIO())
+        self.assertEqual(list(pantry.rank_by_ingredients(Recipe.objects.all(), "green chilly")), [recipe])
+
+
+class RecipeFacetTest(RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_test_user()
+        for category, difficulty, cuisine in [
+            (0, 0, "Indian"), (0, 1, "indian"), (1, 0, "Italian"), (2, 2, "Indian"), (2, 0, "Thai"),
+        ]:
+            self.create_test_recipe(author=self.user, category=category, difficulty=difficulty, cuisine=cuisine)
+
+    def facets(self, params):
+        filterset = RecipeFilter(params, queryset=Recipe.objects.all())
+        self.assertTrue(filterset.is_valid())
+        return filterset.facets()
+
+    def counts(self, facet):
+        return {entry["value"]: entry["count"] for entry in facet}
+
+    def test_counts_in_one_grouped_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            facets = self.facets({})
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(self.counts(facets["category"]), {0: 2, 1: 1, 2: 2})
+        self.assertEqual(self.counts(facets["difficulty"]), {0: 3, 1: 1, 2: 1})
+        self.assertEqual(facets["cuisine"][0], {"value": "Indian", "label": "Indian", "count": 3})
+
+    def test_counts_follow_current_filters(self):
+        facets = self.facets({"category": "2"})
+        self.assertEqual(self.counts(facets["category"]), {0: 0, 1: 0, 2: 2})
+        self.assertEqual(self.counts(facets["cuisine"]), {"Indian": 1, "Thai": 1})
+
+    def test_cached_per_normalized_filters_and_invalidated_on_change(self):
+        self.facets({"category": "0", "search": ""})
+        with CaptureQueriesContext(connection) as queries:
+            facets = self.facets({"category": "0"})
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.counts(facets["category"])[0], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_test_recipe(author=self.user, category=0)
+        self.assertEqual(self.counts(self.facets({"category": "0"})["category"])[0], 3)
+
+    def test_list_page_shows_counts(self):
+        response = self.client.get(reverse("recipe:recipes"))
+        self.assertContains(response, "Veg (2)")
+        self.assertContains(response, "Easy (3)")
+
+
+class RangeFilterTest(RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_test_user()
+        self.light = self.create_test_recipe(author=self.user, title="Salad", prep_time=5, total_time=15)
+        self.create_test_nutrition(recipe=self.light, calories=250, protein=8)
+        self.hearty = self.create_test_recipe(author=self.user, title="Steak", prep_time=20, total_time=60)
+        self.create_test_nutrition(recipe=self.hearty, calories=800, protein=45)
+
+    def filtered(self, params):
+        return list(RecipeFilter(params, queryset=Recipe.objects.order_by("title")).qs)
+
+    def test_nutrition_and_time_ranges(self):
+        self.assertEqual(self.filtered({"calories_max": "500"}), [self.light])
+        self.assertEqual(self.filtered({"protein_min": "30"}), [self.hearty])
+        self.assertEqual(self.filtered({"total_time_max": "20"}), [self.light])
+        self.assertEqual(self.filtered({"calories_min": "200", "calories_max": "900"}), [self.light, self.hearty])
+        self.assertEqual(self.filtered({"calories_max": "500", "protein_min": "30"}), [])
+
+    def test_list_page_filters_with_a_single_nutrition_join(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("recipe:recipes"), {"calories_max": "500"})
+        self.assertEqual(list(response.context["recipes"]), [self.light])
+        self.assertContains(response, "250 kcal")
+        page_queries = [q["sql"] for q in queries.captured_queries if '"recipe_nutrition"' in q["sql"]]
+        self.assertTrue(page_queries)
+        self.assertTrue(all(sql.count('JOIN "recipe_nutrition"') == 1 for sql in page_queries))
+        self.assertFalse([
+            q for q in queries.captured_queries
+            if q["sql"].startswith('SELECT') and 'FROM "recipe_nutrition"' in q["sql"]
+        ])
+
+    def test_benchmark_reports_index_use(self):
+        stdout = StringIO()
+        call_command("benchmark_filters", "--repeat", "1", stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn("under 500 calories", output)
+        if connection.vendor == "sqlite":
+            self.assertIn("nutrition_calories_idx", output)
+            self.assertIn("recipe_total_time_idx", output)
+
+
+class AutocompleteTest(RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_test_user()
+        self.tikka = self.create_test_recipe(author=self.user, title="Chicken Tikka Masala", cuisine="Indian", likes=10)
+        self.create_test_ingredient(recipe=self.tikka, name="Chicken thighs")
+        self.chickpea = self.create_test_recipe(author=self.user, title="Chickpea Curry", cuisine="Indian", likes=1)
+        autocomplete.warm()
+
+    def texts(self, prefix, **kwargs):
+        return [(s["kind"], s["text"]) for s in autocomplete.suggest(prefix, **kwargs)]
+
+    def test_prefix_matches_any_word_ranked_by_weight(self):
+        self.assertEqual(self.texts("tik"), [("recipe", "Chicken Tikka Masala")])
+        self.assertEqual(
+            self.texts("CHIC"),
+            [("recipe", "Chicken Tikka Masala"), ("recipe", "Chickpea Curry"), ("ingredient", "Chicken thighs")],
+        )
+        self.assertEqual(self.texts("ind"), [("cuisine", "Indian")])
+        self.assertEqual(self.texts("chic", limit=1), [("recipe", "Chicken Tikka Masala")])
+        self.assertEqual(self.texts("c"), [])
+
+    def test_lookups_do_not_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.texts("curry")
+        self.assertEqual(len(queries), 0)
+
+    def test_endpoint(self):
+        response = self.client.get(reverse("recipe:autocomplete"), {"q": "indi"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("max-age=60", response["Cache-Control"])
+        self.assertEqual(
+            response.json()["results"],
+            [{"text": "Indian", "kind": "cuisine", "url": reverse("recipe:recipes") + "?cuisine=Indian"}],
+        )
+        response = self.client.get(reverse("recipe:autocomplete"), {"q": "tikka"})
+        self.assertEqual(response.json()["results"][0]["url"], self.tikka.get_absolute_url())
+
+    def test_search_log_feeds_suggestions(self):
+        for _ in range(2):
+            self.client.get(reverse("recipe:recipes"), {"search": "  Butter   Paneer "})
+        self.client.get(reverse("recipe:recipes"), {"search": "butter paneer", "page": "2"})
+        self.assertEqual(SearchQuery.objects.get().count, 2)
+        autocomplete.warm()
+        self.assertEqual(self.texts("pane"), [])
+
+        self.client.get(reverse("recipe:recipes"), {"search": "Butter paneer"})
+        autocomplete.warm()
+        self.assertEqual(self.texts("pane"), [("query", "butter paneer")])
+
+    def test_index_rebuilds_after_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_test_recipe(author=self.user, title="Paneer Butter Masala")
+        with mock.patch.object(autocomplete, "MIN_REBUILD_INTERVAL", 0):
+            with mock.patch.object(autocomplete.threading, "Thread") as thread:
+                # The stale index answers while the rebuild runs in the background.
+                self.assertEqual(self.texts("paneer"), [])
+                self.assertEqual(self.texts("paneer"), [])
+            thread.assert_called_once()
+            thread.return_value.start.assert_called_once_with()
+            with mock.patch.object(autocomplete.connections, "close_all"):
+                thread.call_args.kwargs["target"]()
+            self.assertEqual(self.texts("paneer"), [("recipe", "Paneer Butter Masala")])
+        self.assertFalse(autocomplete._lock.locked())
+
+    def test_lookup_budget_on_large_index(self):
+        index = autocomplete.PrefixIndex(
+            (f"Recipe {word} {i}", autocomplete.TITLE, i % 97, i)
+            for i in range(50000)
+            for word in ("tomato basil", "garlic naan")[i % 2:i % 2 + 1]
+        )
+        with mock.patch.object(index, "_heaviest", wraps=index._heaviest) as heaviest:
+            results = index.lookup("garlic n", limit=3)
+        self.assertTrue(all(int(r["text"].split()[-1]) % 97 == 96 for r in results))
+        # One range query per popped row and its two halves, not per matching row.
+        self.assertLessEqual(heaviest.call_count, 2 * 3 + 1)
+
+
+class SimilarRecipesTest(RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_test_user()
+        self.nutrition = {"calories": 1, "protein": 1, "fat": 1, "sugar": 1, "fiber": 1, "carbohydrates": 1}
+        self.pasta = self.create("Pasta", "Italian", "Tomatoes", "Basil", "Garlic")
+        self.penne = self.create("Penne", "Italian", "Tomato", "Basil", "Parmesan")
+        self.curry = self.create("Curry", "Indian", "Chicken", "Garlic")
+        self.salad = self.create("Salad", "Greek", "Cucumber", "Feta")
+
+    def create(self, title, cuisine, *ingredients):
+        create_recipe_with_details(
+            user=self.user,
+            recipe_data={
+                "title": title, "category": 0, "difficulty": 0, "cuisine": cuisine,
+                "servings": 2, "prep_time": 5, "total_time": 20, "instructions": "Cook.",
+            },
+            nutrition_data=self.nutrition,
+            image_data={},
+            ingredients_data=[{"name": name, "quantity": 1, "unit": 0} for name in ingredients],
+        )
+        return Recipe.objects.get(title=title)
+
+    def titles(self, recipe):
+        return [r.title for r in recommendations.similar_recipes(recipe)]
+
+    def test_ranks_by_shared_ingredients_and_cuisine(self):
+        self.assertEqual(recommendations.refresh_similar(), (4, 4))
+        self.assertEqual(self.titles(self.pasta), ["Penne", "Curry"])
+        self.assertEqual(self.titles(self.curry), ["Pasta"])
+        self.assertEqual(self.titles(self.salad), [])
+        scores = list(RelatedRecipe.objects.filter(recipe=self.pasta).order_by("-score").values_list("score", flat=True))
+        self.assertTrue(1 > scores[0] > scores[1] > 0)
+
+    def test_neighbours_load_card_columns_in_one_query(self):
+        recommendations.refresh_similar()
+        with CaptureQueriesContext(connection) as queries:
+            similar = recommendations.similar_recipes(self.pasta)
+            [recipe.cover_image for recipe in similar]
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"instructions"', queries[0]["sql"])
+        self.assertNotIn('"steps"', queries[0]["sql"])
+
+    @mock.patch.object(recommendations, "MAX_DF_RATIO", 0.8)
+    def test_incremental_refresh_only_rescores_affected_recipes(self):
+        recommendations.refresh_similar()
+        rigatoni = self.create("Rigatoni", "Italian", "Tomato", "Basil", "Garlic")
+
+        rescored, _ = recommendations.refresh_similar()
+        self.assertEqual(rescored, 4)
+        self.assertEqual(self.titles(self.pasta)[0], "Rigatoni")
+        self.assertIn("Pasta", self.titles(rigatoni))
+
+        self.assertEqual(recommendations.refresh_similar(), (0, 0))
+        self.assertEqual(recommendations.refresh_similar(full=True)[0], 5)
+
+    def test_incremental_refresh_refills_lists_shortened_by_deletes(self):
+        recommendations.refresh_similar(top_k=1)
+        self.assertEqual(self.titles(self.pasta), ["Penne"])
+        self.penne.delete()
+        self.assertEqual(self.titles(self.pasta), [])
+        self.assertEqual(recommendations.refresh_similar(top_k=1), (1, 1))
+        self.assertEqual(self.titles(self.pasta), ["Curry"])
+
+    def test_command(self):
+        out = StringIO()
+        call_command("refresh_recommendations", stdout=out)
+        self.assertIn("rescored 4 recipes", out.getvalue())
+
+    def test_detail_page_reads_neighbours_in_one_query(self):
+        url = self.pasta.get_absolute_url()
+        etag = self.client.get(url)["ETag"]
+        recommendations.refresh_similar()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual([r.title for r in response.context["similar_recipes"]], ["Penne", "Curry"])
+        self.assertContains(response, "More <span")
+        related_queries = [q["sql"] for q in queries.captured_queries if "recipe_relatedrecipe" in q["sql"]]
+        self.assertEqual(len(related_queries), 1)
+
+
+class CoLikedRecipesTest(RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = {name: self.create_test_user(username=name) for name in ("alice", "bob", "carol", "dave")}
+        self.recipes = {title: self.create_test_recipe(title=title) for title in "ABCDE"}
+        self.like("alice", "AB")
+        self.like("bob", "ABC")
+        self.like("carol", "CD")
+        self.like("dave", "E")
+
+    def like(self, username, titles):
+        for title in titles:
+            toggle_like(self.users[username], self.recipes[title])
+
+    def neighbours(self, title):
+        return [
+            (r.related.title, round(r.score, 3))
+            for r in RelatedRecipe.objects.filter(recipe=self.recipes[title], kind=RelatedRecipe.Kinds.CO_LIKED)
+            .select_related("related").order_by("-score", "related_id")
+        ]
+
+    def test_cosine_of_co_likes(self):
+        self.assertEqual(recommendations.refresh_co_liked(), (5, 8))
+        self.assertEqual(self.neighbours("A"), [("B", 1.0), ("C", 0.5)])
+        self.assertEqual(self.neighbours("C"), [("D", 0.707), ("A", 0.5), ("B", 0.5)])
+        self.assertEqual(self.neighbours("E"), [])
+
+    def test_incremental_refresh_uses_new_likes_only(self):
+        recommendations.refresh_co_liked()
+        eve = self.users["eve"] = self.create_test_user(username="eve")
+        self.like("eve", "DE")
+
+        self.assertEqual(recommendations.refresh_co_liked(), (3, 6))
+        self.assertEqual(self.neighbours("E"), [("D", 0.5)])
+        self.assertEqual(self.neighbours("C"), [("A", 0.5), ("B", 0.5), ("D", 0.5)])
+        self.assertEqual(self.neighbours("A"), [("B", 1.0), ("C", 0.5)])
+        self.assertEqual(recommendations.refresh_co_liked(), (0, 0))
+
+        toggle_like(eve, self.recipes["E"])
+        recommendations.refresh_co_liked(full=True)
+        self.assertEqual(self.neighbours("E"), [])
+
+    def test_recommendations_exclude_liked_recipes(self):
+        recommendations.refresh_co_liked()
+        self.assertEqual(recommendations.recommended_for(self.users["alice"]), [self.recipes["C"]])
+        self.assertEqual(
+            [r.title for r in recommendations.recommended_for(self.users["carol"])], ["A", "B"]
+        )
+        self.assertEqual(recommendations.recommended_for(self.users["dave"]), [])
+
+    def test_homepage_section_for_logged_in_users(self):
+        call_command("refresh_recommendations", "--kind", "co_liked", stdout=StringIO())
+        response = self.client.get(reverse("recipe:home"))
+        self.assertNotIn("recommended_recipes", response.context)
+
+        self.client.force_login(self.users["alice"])
+        response = self.client.get(reverse("recipe:home"))
+        self.assertEqual(response.context["recommended_recipes"], [self.recipes["C"]])
+        self.assertContains(response, "Recommended <span")
+
+
+class LikedStateTest(RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_test_user()
+        self.recipes = [self.create_test_recipe() for _ in range(4)]
+        toggle_like(self.user, self.recipes[0])
+        toggle_like(self.user, self.recipes[2])
+        self.client.force_login(self.user)
+
+    def get(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        like_queries = [q for q in queries.captured_queries if 'FROM "recipe_recipelike"' in q["sql"]]
+        return response, len(like_queries)
+
+    def liked_titles(self, recipes):
+        return {recipe.title for recipe in recipes if recipe.viewer_liked}
+
+    def expected(self):
+        return {self.recipes[0].title, self.recipes[2].title}
+
+    def test_list_page_resolves_likes_in_one_query(self):
+        for params in ({}, {"pagination": "cursor"}):
+            response, like_queries = self.get(reverse("recipe:recipes"), params)
+            self.assertEqual(like_queries, 1)
+            self.assertEqual(self.liked_titles(response.context["page_obj"]), self.expected())
+            self.assertContains(response, "You liked this", count=2)
+
+    def test_anonymous_visitors_do_not_query_likes(self):
+        self.client.logout()
+        response, like_queries = self.get(reverse("recipe:recipes"))
+        self.assertEqual(like_queries, 0)
+        self.assertEqual(self.liked_titles(response.context["page_obj"]), set())
+
+    def test_collection_page(self):
+        collection = Collection.objects.create(title="Saved", owner=self.user)
+        collection.recipes.add(*self.recipes)
+        response, like_queries = self.get(reverse("recipe:collection_detail", args=[collection.pk]))
+        self.assertEqual(like_queries, 1)
+        self.assertEqual(self.liked_titles(response.context["recipes"]), self.expected())
+
+    def test_homepage_lists_liked_card_ids(self):
+        response, _ = self.get(reverse("recipe:home"))
+        self.assertEqual(response.context["liked_recipe_ids"], sorted([self.recipes[0].pk, self.recipes[2].pk]))
+        self.assertContains(response, 'id="liked-recipe-ids"')
+
+    @override_settings(LIKED_RECIPES_CACHE_TIMEOUT=60)
+    def test_cached_liked_ids_are_dropped_on_toggle(self):
+        self.get(reverse("recipe:recipes"))
+        response, like_queries = self.get(reverse("recipe:recipes"))
+        self.assertEqual(like_queries, 0)
+        self.assertEqual(self.liked_titles(response.context["page_obj"]), self.expected())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("recipe:toggle_like", args=[self.recipes[0].pk]))
+        self.assertEqual(likes.liked_ids(self.user, [r.pk for r in self.recipes]), {self.recipes[2].pk})
+
+
+class RecipeQuerySetShapeTest(TemporaryMediaMixin, RecipeTestDataMixin, TestCase):
+    """Each page's query count must not grow with the number of recipes it shows."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_test_user(is_staff=True, is_superuser=True)
+        self.collection = Collection.objects.create(title="Saved", owner=self.user)
+        self.client.force_login(self.user)
+
+    def add_recipes(self, count):
+        for _ in range(count):
+            recipe = self.create_test_recipe(author=self.user)
+            self.create_test_nutrition(recipe=recipe)
+            self.create_test_image(recipe=recipe)
+            self.create_test_image(recipe=recipe)
+            recipe.refresh_cover_images()
+            self.collection.recipes.add(recipe)
+            RecipeLike.objects.create(user=self.user, recipe=recipe)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries)
+
+    def assert_fixed_queries(self, url, expected):
+        self.add_recipes(2)
+        small = self.count_queries(url)
+        self.add_recipes(6)
+        large = self.count_queries(url)
+        self.assertEqual((small, large), (expected, expected))
+
+    def test_home(self):
+        self.assert_fixed_queries(reverse("recipe:home"), 7)
+
+    def test_recipe_list(self):
+        self.assert_fixed_queries(reverse("recipe:recipes"), 6)
+
+    def test_author_recipes(self):
+        self.assert_fixed_queries(reverse("recipe:author_recipes"), 3)
+
+    def test_collection_detail(self):
+        self.assert_fixed_queries(reverse("recipe:collection_detail", args=[self.collection.pk]), 5)
+
+    def test_admin_recipe_changelist(self):
+        self.assert_fixed_queries(reverse("admin:recipe_recipe_changelist"), 6)
+
+    def test_admin_like_changelist(self):
+        self.assert_fixed_queries(reverse("admin:recipe_recipelike_changelist"), 5)
+
+    def test_cards_skip_instructions(self):
+        self.add_recipes(1)
+        sql = str(Recipe.objects.for_cards("nutrition").query)
+        self.assertNotIn('"instructions"', sql)
+        self.assertNotIn('"steps"', sql)
+        self.assertIn('"recipe_nutrition"."calories"', sql)
+
+
+class CollectionListTest(TemporaryMediaMixin, RecipeTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_test_user()
+        self.client.force_login(self.user)
+        self.url = reverse("recipe:all_collections")
+
+    def add_collection(self, title, recipes):
+        collection = Collection.objects.create(title=title, owner=self.user)
+        for _ in range(recipes):
+            recipe = self.create_test_recipe()
+            self.create_test_image(recipe=recipe)
+            recipe.refresh_cover_images()
+            collection.recipes.add(recipe)
+        return collection
+
+    def get(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries.captured_queries)
+
+    def test_counts_and_previews_in_fixed_queries(self):
+        big = self.add_collection("Big", 7)
+        self.add_collection("Empty", 0)
+        _, small_count = self.get()
+        for i in range(3):
+            self.add_collection(f"More {i}", 5)
+        response, large_count = self.get()
+        self.assertEqual(small_count, large_count)
+
+        by_title = {c.title: c for c in response.context["collections"]}
+        self.assertEqual(by_title["Big"].recipe_count, 7)
+        self.assertEqual(by_title["Empty"].recipe_count, 0)
+        newest = list(big.recipes.order_by("-created", "-id")[:views.COLLECTION_PREVIEW_RECIPES])
+        self.assertEqual(by_title["Big"].preview_recipes, newest)
+        self.assertEqual(by_title["Empty"].preview_recipes, [])
+        self.assertContains(response, "7 recipes")
+
+    def test_paginates_collections(self):
+        for i in range(views.AllCollectionView.paginate_by + 1):
+            Collection.objects.create(title=f"Collection {i}", owner=self.user)
+        response, _ = self.get()
+        self.assertEqual(len(response.context["collections"]), views.AllCollectionView.paginate_by)
+        self.assertContains(response, "Page 1 of 2")
+        response, _ = self.get({"page": 2})
+        self.assertEqual(len(response.context["collections"]), 1)
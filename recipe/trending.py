@@ -0,0 +1,122 @@
+"""
+Time-decayed popularity for the homepage "popular recipes" section.
+
+Scores use forward decay: a like at time ``t`` adds
+``2 ** ((t - EPOCH) / HALF_LIFE - halvings)`` to its recipe's score. Every
+score decays at the same rate, so comparing the stored values ranks recipes
+by decayed popularity and a new like only touches one row. An unlike
+removes exactly the weight its like added. ``recompute()`` rebuilds the
+table from recent RecipeLike rows, drops recipes whose likes have decayed
+away and moves ``halvings`` (see ``TrendScale``) up to the start of the
+window, so stored scores stay small however long the site runs.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import RecipeLike, RecipeTrend, TrendScale
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+HALF_LIFE = timedelta(days=3)
+# Likes older than this contribute under 0.1% of a fresh like.
+WINDOW = HALF_LIFE * 10
+# A like this many half-lives past the scale forces a rebase; floats
+# overflow a little past 2 ** 1023.
+MAX_EXPONENT = 512
+
+
+def _exponent(when):
+    return (when - EPOCH) / HALF_LIFE
+
+
+def _halvings():
+    return TrendScale.objects.values_list('halvings', flat=True).first() or 0.0
+
+
+def like_weight(when, halvings=None):
+    if halvings is None:
+        halvings = _halvings()
+    return 2 ** (_exponent(when) - halvings)
+
+
+def current_score(score, now=None):
+    """Convert a stored score into 'fresh likes' as of ``now``."""
+    return score / like_weight(now or timezone.now())
+
+
+def _add(recipe_id, amount):
+    updated = RecipeTrend.objects.filter(recipe_id=recipe_id).update(score=F('score') + amount)
+    if updated or amount <= 0:
+        return
+    try:
+        with transaction.atomic():
+            RecipeTrend.objects.create(recipe_id=recipe_id, score=amount)
+    except IntegrityError:
+        RecipeTrend.objects.filter(recipe_id=recipe_id).update(score=F('score') + amount)
+
+
+def _rebased(when):
+    """
+    ``recompute()`` on a fresh scale if ``when`` is too far past the current
+    one, e.g. when ``refresh_trending`` has not run for years. The rebuild
+    already reflects the saved (or deleted) like, so callers skip their add.
+    """
+    if _exponent(when) - _halvings() <= MAX_EXPONENT:
+        return False
+    recompute(now=when)
+    return True
+
+
+def record_like(recipe_id, liked_at):
+    """Count a like; call after its RecipeLike row is saved."""
+    if not _rebased(liked_at):
+        _add(recipe_id, like_weight(liked_at))
+
+
+def record_unlike(recipe_id, liked_at):
+    """Remove a like's weight; call after its RecipeLike row is deleted."""
+    if not _rebased(liked_at):
+        _add(recipe_id, -like_weight(liked_at))
+
+
+def popular_recipe_ids(limit):
+    return list(
+        RecipeTrend.objects.filter(score__gt=0)
+        .order_by('-score')
+        .values_list('recipe_id', flat=True)[:limit]
+    )
+
+
+@transaction.atomic
+def recompute(now=None, batch_size=1000):
+    """
+    Rebuild every score from likes inside ``WINDOW`` on a scale starting at
+    the window, and prune stale rows. A like recorded concurrently against
+    the previous scale is off until the next run rebuilds it.
+
+    Returns the number of recipes that are still trending.
+    """
+    started = timezone.now()
+    since = (now or started) - WINDOW
+    halvings = _exponent(since)
+    scores = {}
+    for recipe_id, created in (
+        RecipeLike.objects.filter(created__gte=since)
+        .values_list('recipe_id', 'created')
+        .iterator(chunk_size=batch_size)
+    ):
+        scores[recipe_id] = scores.get(recipe_id, 0) + like_weight(created, halvings)
+
+    TrendScale.objects.update_or_create(pk=1, defaults={'halvings': halvings})
+    RecipeTrend.objects.bulk_create(
+        [RecipeTrend(recipe_id=recipe_id, score=score) for recipe_id, score in scores.items()],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['recipe'],
+        update_fields=['score', 'modified'],
+    )
+    # Rows not refreshed above have no like inside the window any more.
+    RecipeTrend.objects.filter(modified__lt=started).delete()
+    return len(scores)
@@ -9,6 +9,7 @@ urlpatterns=[
     path('recipe/<int:pk>/edit/', views.EditRecipeView.as_view(), name='edit_recipe'),
     path('recipe/<int:pk>/toggle-like/', views.ToggleLikeView.as_view(), name='toggle_like'),
     path("recipes/", views.RecipeListView.as_view(), name="recipes"),
+    path("recipes/autocomplete/", views.AutocompleteView.as_view(), name="autocomplete"),
     path("about/", views.AboutPage.as_view(), name='about'),
 
     path("recipe/<int:recipe_id>/add-to-collection/", views.AddToCollectionView.as_view(), name="add_to_collection"),
@@ -22,4 +23,11 @@ urlpatterns=[
     # Author Recipes
     path("author/recipes/", views.AuthorRecipeListView.as_view(), name="author_recipes"),
     path("recipe/<int:pk>/delete/", views.DeleteRecipeView.as_view(), name="delete_recipe"),
+
+    # Read-only JSON API
+    path("api/recipes/", views.RecipeApiListView.as_view(), name="api_recipes"),
+    path("api/recipes/<int:pk>/", views.RecipeApiDetailView.as_view(), name="api_recipe_detail"),
+
+    # Catalogue export (staff only)
+    path("export/recipes.ndjson", views.ExportRecipesView.as_view(), name="export_recipes"),
 ]
@@ -1,37 +1,93 @@
-from django.http import JsonResponse
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
+from django.template.loader import render_to_string
 from django.views.generic import TemplateView
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
 from django.views import View
 from django.utils.decorators import method_decorator
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import condition
 from .domains import create_recipe_with_details
 from django.utils import timezone
 from django_filters.views import FilterView
 from .filters import RecipeFilter
-from django.db.models import Count
+from .pagination import paginate_by_cursor
+from . import api, autocomplete, caching, exporting, likes, recommendations, trending
 
 from django.views.generic import DetailView,ListView, FormView
 from .forms import CollectionForm
-from .domains import create_recipe_with_details, update_recipe_with_details
-from .models import Recipe, Nutrition, Ingredient, RecipeImage, RecipeLike, Collection
+from .domains import create_recipe_with_details, delete_recipe, toggle_like, update_recipe_with_details
+from .models import (
+    Recipe, Nutrition, Ingredient, RecipeImage, RecipeLike, Collection, RecommenderRun, RelatedRecipe,
+)
 from .forms import IngredientFormSetClass, RecipeForm, NutritionForm, RecipeImageForm, IngredientForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 RECIPES_ON_HOMEPAGE = 5
+COLLECTION_PREVIEW_RECIPES = 4
 
 class HomePage(TemplateView):
     template_name = 'home.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['latest_recipes'] = Recipe.objects.all()[:RECIPES_ON_HOMEPAGE]
-        context['popular_recipes'] = (
-            Recipe.objects.annotate(like_count=Count('liked_by'))
-                  .order_by('-like_count', '-created')[:RECIPES_ON_HOMEPAGE]
+        latest = caching.get_or_compute(
+            caching.HOMEPAGE_LATEST_KEY,
+            lambda: self.render_fragment(
+                'includes/homepage/home_latest_recipes.html', 'latest_recipes', self.get_latest_recipes()
+            ),
         )
+        popular = caching.get_or_compute(
+            caching.HOMEPAGE_POPULAR_KEY,
+            lambda: self.render_fragment(
+                'includes/homepage/home_popular_recipes.html', 'popular_recipes', self.get_popular_recipes()
+            ),
+        )
+        context.update({
+            'latest_recipes': latest['recipes'],
+            'latest_recipes_html': latest['html'],
+            'popular_recipes': popular['recipes'],
+            'popular_recipes_html': popular['html'],
+        })
+        user = self.request.user
+        if user.is_authenticated:
+            # Per viewer, so rendered in the page rather than cached with the shared fragments.
+            context['recommended_recipes'] = recommendations.recommended_for(user, RECIPES_ON_HOMEPAGE)
+            # The cached cards are marked client side from this list.
+            context['liked_recipe_ids'] = sorted(likes.liked_ids(user, latest['ids'] | popular['ids']))
         return context
+
+    def render_fragment(self, template_name, name, recipes):
+        """Render a card section once so it can be cached for every visitor."""
+        return {
+            'recipes': recipes,
+            'ids': {recipe.pk for recipe in recipes},
+            'html': render_to_string(template_name, {name: recipes}),
+        }
+
+    def get_latest_recipes(self):
+        return list(Recipe.objects.for_cards()[:RECIPES_ON_HOMEPAGE])
+
+    def get_popular_recipes(self):
+        """Top recipes by trending score, topped up with the most liked ones."""
+        recipes = Recipe.objects.for_cards()
+        popular_ids = trending.popular_recipe_ids(RECIPES_ON_HOMEPAGE)
+        by_id = recipes.in_bulk(popular_ids)
+        popular = [by_id[pk] for pk in popular_ids if pk in by_id]
+        missing = RECIPES_ON_HOMEPAGE - len(popular)
+        if missing > 0:
+            popular += recipes.exclude(pk__in=popular_ids).order_by('-likes', '-created')[:missing]
+        return popular
     
 
 @method_decorator(login_required, name='dispatch')
@@ -105,26 +161,84 @@ class AddIngredientFormView(View):
         new_total = idx + 1
         return render(request, 'recipe/forms/_ingredient_form.html', {'form': form, 'new_total': new_total})
 
+def recipe_detail_version(request, pk):
+    """
+    Everything the detail page depends on, fetched in one query and memoized
+    on the request: the recipe's own ``modified`` (bumped by every edit),
+    its images, likes, the chef's profile and the last refresh of similar
+    recipes. None if the recipe is missing.
+
+    Only ETags are derived from it: unlikes and image deletes change the
+    version without a newer timestamp, so no Last-Modified is sent.
+    """
+    if not hasattr(request, '_recipe_detail_version'):
+        latest_image = RecipeImage.objects.filter(recipe=OuterRef('pk')).order_by('-modified')
+        latest_like = RecipeLike.objects.filter(recipe=OuterRef('pk')).order_by('-created')
+        similar_run = RecommenderRun.objects.filter(kind=RelatedRecipe.Kinds.SIMILAR)
+        request._recipe_detail_version = (
+            Recipe.objects.filter(pk=pk)
+            .annotate(
+                image_count=Count('images'),
+                latest_image=Subquery(latest_image.values('modified')[:1]),
+                latest_like=Subquery(latest_like.values('created')[:1]),
+                similar_refreshed=Subquery(similar_run.values('finished')[:1]),
+            )
+            .values(
+                'modified', 'likes', 'image_count', 'latest_image', 'latest_like', 'similar_refreshed',
+                'author__profile__modified',
+            )
+            .first()
+        )
+    return request._recipe_detail_version
+
+
+def recipe_detail_etag(request, pk):
+    version = recipe_detail_version(request, pk)
+    if version is None:
+        return None
+    # The page shows per-viewer controls and "today" labels, so both are part of the tag.
+    parts = sorted(version.items()) + [request.user.pk, timezone.now().date()]
+    return hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+@method_decorator(
+    condition(etag_func=recipe_detail_etag),
+    name='dispatch',
+)
 class RecipeDetailView(DetailView):
     model = Recipe
     template_name = 'recipe/detail_recipe.html'
     context_object_name = 'recipe'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        recipe = self.get_object()
+    def get_queryset(self):
+        return Recipe.objects.for_detail(self.request.user)
 
-        instruction_list = [point.strip() for point in recipe.instructions.split(".") if point.strip() ]
+    def get(self, request, *args, **kwargs):
+        """
+        Optionally serve anonymous visitors a rendered copy cached under the
+        page's ETag, so a changed recipe never hits a stale entry.
+        """
+        timeout = getattr(settings, 'RECIPE_PAGE_CACHE_TIMEOUT', 0)
+        if not timeout or request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+
+        key = f"recipe-page:{kwargs['pk']}:{recipe_detail_etag(request, kwargs['pk'])}"
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(content)
+        response = super().get(request, *args, **kwargs)
+        response.render()
+        cache.set(key, response.content, timeout)
+        return response
 
-        liked = False
-        if self.request.user.is_authenticated:
-            liked = recipe.liked_by.filter(
-                id=self.request.user.id
-            ).exists()
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        recipe = self.object
 
         context.update({
-            'instructions': instruction_list,
-            'liked': liked,
+            'instructions': recipe.get_steps(),
+            'liked': recipe.viewer_liked,
+            'similar_recipes': recommendations.similar_recipes(recipe),
             'now': timezone.now()
         })
 
@@ -196,19 +310,9 @@ class ToggleLikeView(LoginRequiredMixin, View):
     """
 
     def post(self, request, pk, *args, **kwargs):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        user = request.user
-        like, created = RecipeLike.objects.get_or_create(user=user, recipe=recipe)
-        if not created:
-            # Unlike if it already existed
-            like.delete()
-            liked = False
-        else:
-            # Liked
-            liked = True
+        recipe = get_object_or_404(Recipe.objects.only('pk', 'likes'), pk=pk)
+        liked, total_likes = toggle_like(request.user, recipe)
 
-        total_likes = recipe.recipe_likes.count()
-        
         return JsonResponse({
             'liked': liked,
             'total_likes': total_likes,
@@ -334,10 +438,19 @@ class AllCollectionView(LoginRequiredMixin, ListView):
     model = Collection
     template_name = "recipe/all_collections.html"
     context_object_name = "collections"
+    paginate_by = 20
 
     def get_queryset(self):
-        # Prefetch recipes for efficiency
-        return Collection.objects.filter(owner=self.request.user).prefetch_related('recipes')
+        """
+        Count recipes in SQL and prefetch only the newest few per collection
+        (a window-limited prefetch) for the cover mosaic, never whole collections.
+        """
+        preview = Recipe.objects.for_cards().order_by('-created', '-id')[:COLLECTION_PREVIEW_RECIPES]
+        return (
+            Collection.objects.filter(owner=self.request.user)
+            .annotate(recipe_count=Count('recipes'))
+            .prefetch_related(Prefetch('recipes', queryset=preview, to_attr='preview_recipes'))
+        )
 
 
 class CollectionDetailView(LoginRequiredMixin, View):
@@ -345,7 +458,7 @@ class CollectionDetailView(LoginRequiredMixin, View):
 
     def get(self, request, pk):
         collection = get_object_or_404(Collection, pk=pk, owner=request.user)
-        recipes = collection.recipes.prefetch_related('images')
+        recipes = likes.mark_liked(collection.recipes.for_cards(), request.user)
         form = CollectionForm(instance=collection)
         return render(request, self.template_name, {
             'collection': collection,
@@ -373,7 +486,7 @@ class CollectionDetailView(LoginRequiredMixin, View):
             return redirect('recipe:collection_detail', pk=collection.pk)
 
         # Only fetch recipes and form if rendering template due to error
-        recipes = collection.recipes.prefetch_related('images')
+        recipes = collection.recipes.for_cards()
         form = CollectionForm(instance=collection)
         return render(request, self.template_name, {
             'collection': collection,
@@ -399,7 +512,7 @@ class AuthorRecipeListView(LoginRequiredMixin, ListView):
     context_object_name = "recipes"
 
     def get_queryset(self):
-        return Recipe.objects.filter(author=self.request.user).order_by('-created').prefetch_related('images')
+        return Recipe.objects.filter(author=self.request.user).order_by('-created').for_cards()
 
 class DeleteRecipeView(LoginRequiredMixin, View):
     template_name = "recipe/confirm_delete_recipe.html"
@@ -410,7 +523,7 @@ class DeleteRecipeView(LoginRequiredMixin, View):
 
     def post(self, request, pk):
         recipe = get_object_or_404(Recipe, pk=pk, author=request.user)
-        recipe.delete()
+        delete_recipe(recipe)
         return redirect('recipe:author_recipes')
     
 class RecipeListView(FilterView):
@@ -420,8 +533,161 @@ class RecipeListView(FilterView):
     paginate_by = 12
     filterset_class = RecipeFilter
 
+    def get(self, request, *args, **kwargs):
+        # Only first pages count as a search; paging through results does not.
+        if request.GET.get('search') and not (request.GET.get('page') or request.GET.get('cursor')):
+            autocomplete.log_query(request.GET['search'])
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self):
-        return Recipe.objects.all().order_by("-created")
+        # The nutrition join serves both the range filters and the card's calorie label.
+        return Recipe.objects.for_cards('nutrition').order_by("-created")
+
+    def uses_cursor_pagination(self):
+        """Keyset pagination is opt-in via ``?pagination=cursor`` or a ``cursor`` parameter."""
+        return self.request.GET.get('pagination') == 'cursor' or 'cursor' in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.uses_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        page = paginate_by_cursor(queryset, self.request.GET.get('cursor'), page_size)
+        return (None, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_pagination'] = self.uses_cursor_pagination()
+        context['facets'] = self.filterset.facets()
+        # Iterating the page caches its rows, so the template sees the marked objects.
+        likes.mark_liked(context['page_obj'], self.request.user)
+        if context['cursor_pagination']:
+            params = self.request.GET.copy()
+            params.pop('cursor', None)
+            params['pagination'] = 'cursor'
+            context['cursor_query'] = params.urlencode()
+        return context
 
 class AboutPage(TemplateView):
     template_name = 'about.html'
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class ExportRecipesView(View):
+    """Stream the catalogue as NDJSON, filtered like ``manage.py export_recipes``."""
+
+    def get(self, request):
+        try:
+            recipes = exporting.export_queryset(
+                author=request.GET.get('author'),
+                category=request.GET.get('category'),
+                modified_since=exporting.parse_modified_since(request.GET.get('modified_since')),
+            )
+        except exporting.InvalidExportFilter as exc:
+            return HttpResponseBadRequest(str(exc))
+        response = StreamingHttpResponse(
+            exporting.export_lines(recipes, build_url=request.build_absolute_uri),
+            content_type='application/x-ndjson',
+        )
+        response['Content-Disposition'] = 'attachment; filename="recipes.ndjson"'
+        return response
+
+
+class RecipeApiMixin:
+    default_fields = api.LIST_FIELDS
+
+    def get_fields(self):
+        return api.parse_fields(self.request.GET.get('fields'), self.default_fields)
+
+    def json_error(self, message, status=400):
+        return JsonResponse({'error': message}, status=status)
+
+
+class RecipeApiListView(RecipeApiMixin, View):
+    """``RecipeListView`` as JSON: same filters, cursor pagination, sparse fieldsets."""
+    page_size = 20
+    max_page_size = 100
+
+    def get(self, request):
+        try:
+            fields = self.get_fields()
+        except api.InvalidFields as exc:
+            return self.json_error(str(exc))
+        try:
+            page_size = min(int(request.GET.get('page_size', self.page_size)), self.max_page_size)
+        except ValueError:
+            return self.json_error("page_size must be an integer.")
+        if page_size < 1:
+            return self.json_error("page_size must be positive.")
+
+        filterset = RecipeFilter(request.GET, queryset=Recipe.objects.all())
+        if not filterset.is_valid():
+            return self.json_error(filterset.errors.get_json_data())
+        queryset = api.shape_queryset(filterset.qs, fields)
+        try:
+            page = paginate_by_cursor(queryset, request.GET.get('cursor'), page_size)
+        except Http404:
+            return self.json_error("Invalid cursor.")
+
+        response = JsonResponse({
+            'results': [api.serialize(recipe, fields, request) for recipe in page],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        })
+        # Listings have no cheap version to check first; hashing the body
+        # still saves clients the transfer when nothing changed.
+        etag = f'"{hashlib.md5(response.content, usedforsecurity=False).hexdigest()}"'
+        response['ETag'] = etag
+        return get_conditional_response(request, etag=etag, response=response)
+
+
+def recipe_api_etag(request, pk):
+    version = recipe_detail_version(request, pk)
+    if version is None:
+        return None
+    parts = sorted(version.items()) + [request.GET.get('fields', '')]
+    return hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+@method_decorator(
+    condition(etag_func=recipe_api_etag),
+    name='dispatch',
+)
+class RecipeApiDetailView(RecipeApiMixin, View):
+    default_fields = api.DETAIL_FIELDS
+
+    def get(self, request, pk):
+        try:
+            fields = self.get_fields()
+        except api.InvalidFields as exc:
+            return self.json_error(str(exc))
+        recipe = get_object_or_404(api.shape_queryset(Recipe.objects.all(), fields), pk=pk)
+        return JsonResponse(api.serialize(recipe, fields, request))
+
+
+class AutocompleteView(View):
+    """Suggestions for ``?q=<prefix>`` from the in-memory prefix index."""
+    filter_params = {
+        autocomplete.CUISINE: 'cuisine',
+        autocomplete.INGREDIENT: 'ingredients',
+        autocomplete.QUERY: 'search',
+    }
+
+    def get(self, request):
+        try:
+            limit = int(request.GET.get('limit', autocomplete.DEFAULT_LIMIT))
+        except ValueError:
+            limit = autocomplete.DEFAULT_LIMIT
+        suggestions = autocomplete.suggest(request.GET.get('q', ''), max(limit, 1))
+        response = JsonResponse({
+            'results': [
+                {'text': s['text'], 'kind': s['kind'], 'url': self.suggestion_url(s)}
+                for s in suggestions
+            ],
+        })
+        patch_cache_control(response, public=True, max_age=60)
+        return response
+
+    def suggestion_url(self, suggestion):
+        if suggestion['kind'] == autocomplete.TITLE:
+            return reverse('recipe:recipe_detail', kwargs={'pk': suggestion['pk']})
+        param = self.filter_params[suggestion['kind']]
+        return f"{reverse('recipe:recipes')}?{urlencode({param: suggestion['text']})}"
@@ -138,6 +138,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media' 
 
+# A shared cache lets invalidations reach every worker; the default
+# LocMemCache is private to each process.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
+# Seconds to cache rendered recipe pages for anonymous visitors (0 disables).
+RECIPE_PAGE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_PAGE_CACHE_TIMEOUT', 0))
+# Seconds to cache each user's liked recipe ids for card hearts (0 queries per page instead).
+LIKED_RECIPES_CACHE_TIMEOUT = int(os.environ.get('LIKED_RECIPES_CACHE_TIMEOUT', 0))
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'recipe:home'
 LOGOUT_REDIRECT_URL = 'recipe:home'
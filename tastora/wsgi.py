@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tastora.settings')
 
 application = get_wsgi_application()
+
+# Build the autocomplete index before the first request instead of during it.
+from recipe.autocomplete import warm_on_startup  # noqa: E402
+
+warm_on_startup()